@@ -1,9 +1,12 @@
+from atlas import save_atlas_sets
 from canvas import Canvas
+from pools import DEFAULT_BUDGET, LazyPool
+from scene import Scene, save_scenes
 import numpy as np
 
 
 class ArrowSpan(Canvas):
-    def __init__(self, size=(1210, 1210), mode="RGBA", background_color=(255, 255, 255, 255), name="arrow_span"):
+    def __init__(self, size=(1210, 1210), mode="auto", background_color=(255, 255, 255, 255), name="arrow_span"):
         super(ArrowSpan, self).__init__(size=size, mode=mode, background_color=background_color, name=name)
 
     @staticmethod
@@ -22,36 +25,71 @@ class ArrowSpan(Canvas):
                 "arrow_tip_length": arrow_tip_length}
 
     @classmethod
-    def create_all_arrows(cls, config=None):
+    def create_arrow_scenes(cls, config=None):
         if not config:
             config = cls.create_config()
 
         arrows = []
         for length in config["lengths"]:
             for angle in config["angles"]:
-                new_arrow = cls(size=config["image_size"], background_color=config["background_color"],
-                                name=f"arrow_{length}_{angle}")
-                new_arrow.draw_radial_arrow(angle=angle, length=length, color=config["arrow_color"],
-                                            line_thickness=config["line_thickness"],
-                                            tip_width=config["arrow_tip_width"],
-                                            tip_length=config["arrow_tip_length"])
+                new_arrow = Scene(cls, config["image_size"], name=f"arrow_{length}_{angle}",
+                                  background_color=config["background_color"])
+                new_arrow.add("draw_radial_arrow", lengths=("length", "line_thickness", "tip_width", "tip_length"),
+                              angle=angle, length=length, color=config["arrow_color"],
+                              line_thickness=config["line_thickness"], tip_width=config["arrow_tip_width"],
+                              tip_length=config["arrow_tip_length"])
                 arrows.append(new_arrow)
 
         return np.array(arrows)
 
     @classmethod
-    def create_set(cls, arrows, set_size=6, name="set"):
-        arrow_set = np.random.choice(arrows, set_size)
+    def create_all_arrows(cls, config=None, budget=DEFAULT_BUDGET):
+        # the arrows are only drawn when they are first used
+        return LazyPool(cls.create_arrow_scenes(config), budget=budget)
 
-        for i, arrow in enumerate(arrow_set):
-            arrow.name = f"{name}_{i}"
+    @classmethod
+    def create_set(cls, arrows, set_size=6, name="set"):
+        # the pool's members are shared between sets, so the members' names are returned alongside them
+        arrow_set = arrows.choice(set_size)
 
-        return arrow_set
+        return [(f"{name}_{i}", arrows[index]) for i, index in enumerate(arrow_set)]
 
     @classmethod
-    def create_batch(cls, batch_size=15, set_size=6, folder="arrow_span/", config=None):
-        arrows = cls.create_all_arrows(config)
-        for i in range(batch_size):
+    def create_scenes(cls, batch_size=15, set_size=6, folder="arrow_span/", config=None, seed=None, indices=None,
+                      arrows=None, budget=DEFAULT_BUDGET):
+        if indices is None:
+            indices = range(batch_size)
+
+        # sets are drawn from the given pool, e.g. one shared by several calls (see batch.shared_pools)
+        if arrows is None:
+            arrows = cls.create_all_arrows(config, budget)
+        for i in indices:
+            if seed is not None:
+                cls.seed_random(seed, i)
+
             new_set = cls.create_set(arrows, set_size, name=f"set{i}")
-            for arrow in new_set:
-                arrow.save(path=folder)
+            for name, arrow in new_set:
+                yield f"{folder}{name}", arrow
+
+    @classmethod
+    def create_batch(cls, batch_size=15, set_size=6, folder="arrow_span/", config=None, seed=None, indices=None,
+                     sink=None, save_options=None, image_sizes=None, supersample=1, arrows=None, atlas=False,
+                     budget=DEFAULT_BUDGET):
+        # the pool is saved once as an atlas image, each set as an index of its regions (see atlas.py)
+        if atlas:
+            # the indices may be an iterator, they are read once
+            indices = list(range(batch_size) if indices is None else indices)
+            if arrows is None:
+                arrows = cls.create_all_arrows(config, budget)
+
+            sets = {}
+            for index in indices:
+                sets[index] = list(cls.create_scenes(batch_size=batch_size, set_size=set_size, folder=folder,
+                                                     config=config, seed=seed, indices=[index], arrows=arrows))
+            save_atlas_sets(arrows, sets, folder=folder, sink=sink, save_options=save_options, image_sizes=image_sizes,
+                            supersample=supersample, save_atlas=0 in indices)
+            return
+
+        scenes = cls.create_scenes(batch_size=batch_size, set_size=set_size, folder=folder, config=config, seed=seed,
+                                   indices=indices, arrows=arrows, budget=budget)
+        save_scenes(scenes, sizes=image_sizes, sink=sink, supersample=supersample, save_options=save_options)
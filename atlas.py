@@ -0,0 +1,206 @@
+import json
+import math
+
+from PIL import Image, ImageChops
+
+from canvas import MODES, mode_color
+from pools import LazyPool
+from scene import size_folder
+from sinks import DirectorySink
+
+
+def content_box(image, background_color):
+    """
+    Bounding box of the pixels that differ from the background.
+
+    :param image: Image
+    :param background_color: Background color of the image
+    :returns: Box (left, top, right, bottom), or None if the image is blank
+    """
+
+    # 1-bit pixels may be stored as 1 or 255, in "L" they are always 0 or 255
+    if image.mode == "1":
+        image = image.convert("L")
+
+    # any band of the difference that isn't zero
+    background = Image.new(image.mode, image.size, mode_color(background_color, image.mode))
+    boxes = [box for box in (band.getbbox() for band in ImageChops.difference(image, background).split()) if box]
+    if not boxes:
+        return None
+
+    left, top, right, bottom = zip(*boxes)
+    return min(left), min(top), max(right), max(bottom)
+
+
+def pack_shelves(sizes, padding=1):
+    """
+    Places rectangles on shelves of a roughly square image, the tallest first.
+
+    :param sizes: List of sizes (width, height)
+    :param padding: Pixels left free around each rectangle, so regions don't bleed into each other when scaled
+    :returns: Pair of the positions (left, top) of the rectangles and the size of the image
+    """
+
+    if not sizes:
+        return [], (1, 1)
+
+    area = sum((width + padding) * (height + padding) for width, height in sizes)
+    atlas_width = max(max(width for width, _ in sizes) + 2 * padding, math.ceil(math.sqrt(area)))
+
+    positions = [None] * len(sizes)
+    x, y, shelf_height = padding, padding, 0
+    for i in sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], i)):
+        width, height = sizes[i]
+        if x + width + padding > atlas_width:
+            x, y = padding, y + shelf_height + padding
+            shelf_height = 0
+
+        positions[i] = (x, y)
+        x += width + padding
+        shelf_height = max(shelf_height, height)
+
+    return positions, (atlas_width, y + shelf_height + padding)
+
+
+class Atlas:
+    """
+    Single image holding the members of a stimulus pool, each cropped to its content and packed once, e.g. the arrows
+    of an ArrowSpan pool. A stimulus is drawn by filling an image of the stimulus size with the background color and
+    copying the member's region of the atlas to its offset.
+    """
+
+    def __init__(self, scenes, size=None, supersample=1, padding=1):
+        """
+        :param scenes: Scenes of the pool, e.g. from ArrowSpan.create_arrow_scenes
+        :param size: Size of the stimuli, by default the scenes' size
+        :param supersample: See Scene.render
+        :param padding: See pack_shelves
+        """
+
+        # an empty pool gives an empty atlas, like pack_shelves
+        if not size:
+            size = scenes[0].size if len(scenes) else (1, 1)
+        self.size = tuple(size)
+        self.background_color = scenes[0].background_color if len(scenes) else (255, 255, 255, 255)
+
+        images = [scene.render(self.size, supersample=supersample).image for scene in scenes]
+        self.mode = max((image.mode for image in images), key=MODES.index, default="L")
+
+        # identical members, e.g. mirrored symmetric letters, share a region
+        crops, unique = [], {}
+        self.members = []
+        for image in images:
+            box = content_box(image, self.background_color)
+            if box is None:
+                self.members.append(None)
+                continue
+
+            crop = image.crop(box).convert(self.mode)
+            key = (crop.size, crop.tobytes())
+            if key not in unique:
+                unique[key] = len(crops)
+                crops.append(crop)
+            self.members.append((unique[key], box[:2]))
+
+        positions, atlas_size = pack_shelves([crop.size for crop in crops], padding)
+        self.image = Image.new(self.mode, atlas_size, mode_color(self.background_color, self.mode))
+        for crop, position in zip(crops, positions):
+            self.image.paste(crop, position)
+
+        # region (x, y, width, height) of each unique crop
+        self.regions = [position + crop.size for crop, position in zip(crops, positions)]
+
+    def region(self, item):
+        """
+        Where a member of the pool is in the atlas and where it goes in the stimulus.
+
+        :param item: Index of the member in the pool
+        :returns: Pair of the region (x, y, width, height) and the offset (left, top), or None for blank members
+        """
+
+        if self.members[item] is None:
+            return None
+
+        crop, offset = self.members[item]
+        return self.regions[crop], offset
+
+    def set_index(self, members, atlas_filename):
+        """
+        Describes a set for drawing it from the atlas.
+
+        :param members: List of (name, index of the member in the pool) pairs
+        :param atlas_filename: Filename of the atlas image, relative to the index
+        :returns: Dict that can be stored as JSON
+        """
+
+        placements = []
+        for name, item in members:
+            region = self.region(item)
+            placements.append({"name": name, "item": item, "region": region and list(region[0]),
+                               "offset": region and list(region[1])})
+
+        return {"atlas": atlas_filename, "size": list(self.size), "background": list(self.background_color),
+                "members": placements}
+
+
+def pool_atlas(pool, size=None, supersample=1):
+    """
+    Atlas of a LazyPool, built once per size and reused by every set of the pool, e.g. when sets are saved one by one.
+    The atlases are kept by the pool, so they are freed with it.
+
+    :param pool: LazyPool
+    :param size: Size (width, height) of the stimuli as a tuple, by default the scenes' size
+    :param supersample: See Scene.render
+    :returns: Atlas
+    """
+
+    key = (size, supersample)
+    if key not in pool.atlases:
+        pool.atlases[key] = Atlas(pool, size, supersample=supersample)
+
+    return pool.atlases[key]
+
+
+def save_atlas_sets(pool, sets, folder="", sink=None, save_options=None, image_sizes=None, supersample=1,
+                    save_atlas=True):
+    """
+    Saves sets of a stimulus pool as an atlas image of the pool (atlas.png) and one compact JSON index per set
+    (e.g. set0.json), instead of an image per set member.
+
+    :param pool: Scenes of the pool, the atlases of a LazyPool are only built once (see pool_atlas)
+    :param sets: Dict mapping the index of each set to its (filename without extension, scene) pairs, the scenes being
+                 members of the pool
+    :param folder: Folder of the files, with trailing separator
+    :param sink: Sink to save to (see sinks.py)
+    :param save_options: Arguments of Canvas.save like extension and depth, used for the atlas
+    :param image_sizes: List of sizes, see scene.save_scenes
+    :param supersample: See Scene.render
+    :param save_atlas: Whether the atlas image is saved, jobs creating other sets of the same pool leave it out
+    :returns: None
+    """
+
+    if sink is None:
+        sink = DirectorySink()
+    if save_options is None:
+        save_options = {}
+
+    options = dict(save_options)
+    extension = options.pop("extension", "png")
+
+    items = {scene: i for i, scene in enumerate(pool)}
+    sets = {index: [(filename.rsplit("/", 1)[-1], items[scene]) for filename, scene in scenes]
+            for index, scenes in sets.items()}
+
+    for size in image_sizes or (None,):
+        path = f"{size_folder(size)}{folder}" if size else folder
+        if isinstance(pool, LazyPool):
+            atlas = pool_atlas(pool, tuple(size) if size else None, supersample)
+        else:
+            atlas = Atlas(pool, size, supersample=supersample)
+
+        if save_atlas:
+            sink.write(f"{path}atlas.{extension}", sink.encode(atlas.image, extension, **options))
+
+        for index, members in sets.items():
+            text = json.dumps(atlas.set_index(members, f"atlas.{extension}"), separators=(",", ":"))
+            sink.write(f"{path}set{index}.json", text.encode())
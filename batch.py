@@ -0,0 +1,219 @@
+import inspect
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import instrumentation
+from arrow_span import ArrowSpan
+from dot_span import DotSpan
+from pools import DEFAULT_BUDGET
+from rotation_span import RotationSpan
+from sinks import DirectorySink, MemorySink, RecordingSink, ThreadedSink
+from symmetry_span import SymmetrySpan
+
+# paradigms of the battery and the arguments their batches are created with
+BATTERY = ((RotationSpan, {}), (ArrowSpan, {}), (DotSpan, {}), (SymmetrySpan, {}))
+
+# create_batch arguments taking a stimulus pool (see pools.LazyPool), and the methods creating the pools
+POOL_ARGUMENTS = {"arrows": "create_all_arrows", "letters": "create_all_letters"}
+
+
+def batch_length(cls, **kwargs):
+    """
+    Number of independently seeded stimuli (or sets) a call to cls.create_batch creates.
+
+    :param cls: Paradigm class
+    :param kwargs: Arguments of create_batch
+    :returns: Number of stimuli
+    """
+
+    arguments = inspect.signature(cls.create_batch).bind_partial(**kwargs)
+    arguments.apply_defaults()
+    arguments = arguments.arguments
+
+    if "batch_size" in arguments:
+        return arguments["batch_size"]
+    return arguments["n_symm"] + arguments["n_asymm"]
+
+
+def create_jobs(batches=BATTERY, seed=0, chunk_size=1, manifest=None, shard=0, shards=1):
+    """
+    Splits the batches into jobs of at most chunk_size stimuli each. Every stimulus is seeded by its own index, so the
+    output does not depend on how the jobs are distributed.
+
+    :param batches: Pairs of paradigm class and create_batch arguments
+    :param seed: Root seed shared by all jobs
+    :param chunk_size: Maximum number of stimuli per job
+    :param manifest: Manifest of an earlier run (see manifest.py), stimuli that are fresh according to it are left out
+    :param shard: Index of the shard whose stimuli are created
+    :param shards: Number of shards the stimuli of all batches are dealt to in turn, see run_batches
+    :returns: List of (paradigm class, create_batch arguments) pairs
+    """
+
+    if not 0 <= shard < shards:
+        raise ValueError(f"Shard {shard} doesn't exist, there are {shards} shards!")
+
+    jobs = []
+    position = 0
+    for cls, kwargs in batches:
+        n = batch_length(cls, **kwargs)
+        indices = range((shard - position) % shards, n, shards)
+        position += n
+
+        if manifest is not None:
+            indices = manifest.stale(cls, kwargs, seed, indices)
+
+        for start in range(0, len(indices), chunk_size):
+            jobs.append((cls, dict(kwargs, seed=seed, indices=indices[start:start + chunk_size])))
+
+    return jobs
+
+
+def shared_pools(cls, kwargs):
+    """
+    Creates the stimulus pools of a paradigm, so several create_batch calls can draw from the same pools.
+
+    :param cls: Paradigm class
+    :param kwargs: Arguments of create_batch
+    :returns: Dict of create_batch arguments holding the pools
+    """
+
+    parameters = inspect.signature(cls.create_batch).parameters
+
+    return {argument: getattr(cls, method)(kwargs.get("config"), kwargs.get("budget", DEFAULT_BUDGET))
+            for argument, method in POOL_ARGUMENTS.items() if argument in parameters and kwargs.get(argument) is None}
+
+
+def call_create_batch(cls, kwargs, sink, record=False):
+    """
+    Calls cls.create_batch, once per stimulus if the files of each stimulus are recorded.
+
+    :param cls: Paradigm class
+    :param kwargs: Arguments of create_batch
+    :param sink: Sink to save to
+    :param record: Whether the digests of the files are recorded
+    :returns: Dict mapping the index of each stimulus to a dict of its filenames and their digests if record is set,
+              None otherwise
+    """
+
+    if not record:
+        cls.create_batch(**dict(kwargs, sink=sink))
+        return
+
+    recording = RecordingSink(sink)
+    kwargs = dict(kwargs, **shared_pools(cls, kwargs))
+    for index in kwargs["indices"]:
+        recording.stimulus = index
+        recording.files[index] = {}
+        cls.create_batch(**dict(kwargs, indices=[index], sink=recording))
+
+    return recording.files
+
+
+def run_job(job, collect=False, threaded=False, record=False):
+    """
+    Creates the stimuli of one job.
+
+    :param job: Pair of paradigm class and create_batch arguments
+    :param collect: Whether the files are kept in memory and returned instead of being written
+    :param threaded: Whether files are written on a background thread, unless the job brings its own sink
+    :param record: Whether the digests of the files of each stimulus are recorded and returned (see
+                   call_create_batch)
+    :returns: MemorySink holding the files if collect is set, otherwise the digests if record is set, None otherwise
+    """
+
+    cls, kwargs = job
+
+    # a sink passed in by the caller is also closed by the caller
+    if "sink" in kwargs:
+        return call_create_batch(cls, kwargs, kwargs["sink"], record=record)
+
+    if collect:
+        sink = MemorySink()
+    else:
+        sink = DirectorySink()
+
+    if threaded:
+        with ThreadedSink(sink) as threaded_sink:
+            files = call_create_batch(cls, kwargs, threaded_sink, record=record)
+    else:
+        files = call_create_batch(cls, kwargs, sink, record=record)
+
+    if collect:
+        return sink
+    return files
+
+
+def run_batches(batches=BATTERY, workers=None, seed=0, chunk_size=None, sink=None, threaded=False, manifest=None,
+                shard=0, shards=1):
+    """
+    Creates the batches of several paradigms using a pool of worker processes.
+
+    :param batches: Pairs of paradigm class and create_batch arguments
+    :param workers: Number of worker processes, defaults to the number of CPUs. A single worker runs in this process,
+                    which is required for batches drawing from a pattern index (see patterns.PatternIndex).
+    :param seed: Root seed of all batches
+    :param chunk_size: Maximum number of stimuli per job. By default, each worker gets about one job per paradigm, so
+                       stimulus pools are only created once per worker.
+    :param sink: Sink all files are saved to (see sinks.py), by default each file is written to its folder. Workers
+                 hand their files to this process, which writes them to the sink in a fixed order.
+    :param threaded: Whether files are written on a background thread of each worker. Wrap the sink in a ThreadedSink to
+                     also write to it in the background.
+    :param manifest: Manifest of an earlier run (see manifest.py). Stimuli whose inputs and files are unchanged are
+                     skipped, the others are created and recorded, and the manifest is saved. Only for files written
+                     to their folders, not to a sink.
+    :param shard: Index of the shard whose stimuli are created, from 0 to shards - 1
+    :param shards: Number of shards. The stimuli of all batches are dealt to the shards in turn, so each shard gets a
+                   similar share of every paradigm. As every stimulus is seeded by the root seed, its paradigm and its
+                   index, shards can run on different machines, and together they create exactly the files of a run
+                   without shards.
+    :returns: None
+
+    If instrumentation is enabled, the numbers recorded by the workers are merged into those of this process.
+    """
+
+    if manifest is not None and sink is not None:
+        raise ValueError("A manifest only records files written to their folders, not to a sink!")
+
+    if not workers:
+        workers = os.cpu_count() or 1
+    if workers > 1 and any(kwargs.get("index") is not None for _, kwargs in batches):
+        raise ValueError("Each worker process would get its own copy of the pattern index, use a single worker!")
+
+    if not chunk_size:
+        chunk_size = max(1, max(math.ceil(batch_length(cls, **kwargs) / (workers * shards)) for cls, kwargs in batches))
+
+    jobs = create_jobs(batches, seed=seed, chunk_size=chunk_size, manifest=manifest, shard=shard, shards=shards)
+    record = manifest is not None
+
+    if workers == 1:
+        for cls, kwargs in jobs:
+            if sink is not None:
+                kwargs = dict(kwargs, sink=sink)
+            files = run_job((cls, kwargs), threaded=threaded, record=record)
+            if record:
+                manifest.record(cls, kwargs, seed, files)
+    else:
+        collect = sink is not None
+        profile = instrumentation.enabled()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            if profile:
+                futures = {executor.submit(instrumentation.profiled, run_job, job, collect=collect, threaded=threaded,
+                                           record=record): job for job in jobs}
+            else:
+                futures = {executor.submit(run_job, job, collect=collect, threaded=threaded, record=record): job
+                           for job in jobs}
+
+            for future in (futures if collect else as_completed(futures)):
+                result = future.result()
+                if profile:
+                    result, recorded = result
+                    instrumentation.merge(recorded)
+                if collect:
+                    result.replay(sink)
+                if record:
+                    cls, kwargs = futures[future]
+                    manifest.record(cls, kwargs, seed, result)
+
+    if record:
+        manifest.save()
@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import PIL
+
+import frames
+import glyphs
+import overlay
+import rotation
+from arrow_span import ArrowSpan
+from canvas import Canvas
+from dot_span import DotSpan
+from rotation_span import RotationSpan
+from sinks import DirectorySink, TimedSink
+from symmetry_span import SymmetrySpan
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PARADIGMS = {"arrow_span": ArrowSpan, "rotation_span": RotationSpan, "dot_span": DotSpan,
+             "symmetry_span": SymmetrySpan}
+PRIMITIVES = ("draw_grid", "draw_arrow", "draw_letter", "draw_dot", "draw_checker_pattern", "save")
+
+# caches of drawn layers, fonts and rotations, emptied before each run so a repeated case doesn't only measure lookups
+CACHES = (glyphs.load_font, glyphs.letter_layer, glyphs.glyph_layer, overlay._overlay_layer, overlay.grid_layer,
+          rotation.rotation, frames._ellipse_mask)
+
+
+def clear_caches():
+    for cache in CACHES:
+        cache.cache_clear()
+
+
+def primitive_case(name, image_size, grid):
+    """
+    Sets up a single call of a Canvas primitive on a fresh canvas.
+
+    :param name: Name of the primitive
+    :param image_size: Width and height of the canvas
+    :param grid: Number of rows and columns of the grid
+    :returns: Function taking a sink and running the primitive
+    """
+
+    canvas = Canvas(size=(image_size, image_size))
+    center = (image_size / 2, image_size / 2)
+
+    if name == "draw_grid":
+        return lambda sink: canvas.draw_grid(rows=grid, cols=grid)
+    if name == "draw_arrow":
+        return lambda sink: canvas.draw_radial_arrow(angle=45)
+    if name == "draw_letter":
+        return lambda sink: canvas.draw_letter("F", location=center, mirror=True, angle=45)
+    if name == "draw_dot":
+        return lambda sink: canvas.draw_dot(center=center)
+    if name == "draw_checker_pattern":
+        return lambda sink: canvas.draw_checker_pattern()
+    if name == "save":
+        # a typical stimulus, so the encoder sees realistic content
+        canvas.draw_grid(rows=grid, cols=grid)
+        canvas.draw_radial_arrow(angle=45)
+        return lambda sink: canvas.save(path="", name_overwrite="save", sink=sink)
+
+    raise ValueError(f"Unknown primitive {name}!")
+
+
+def paradigm_case(name, image_size, grid, batch_size):
+    """
+    Sets up the creation of a batch of a paradigm.
+
+    :param name: Folder name of the paradigm
+    :param image_size: Width and height of the stimuli
+    :param grid: Number of rows and columns of the grid of DotSpan and SymmetrySpan
+    :param batch_size: Number of stimuli (or sets) of the batch
+    :returns: Function taking a sink and creating the batch
+    """
+
+    cls = PARADIGMS[name]
+    size = (image_size, image_size)
+    kwargs = {"folder": f"{name}/", "seed": 0}
+
+    if cls in (ArrowSpan, RotationSpan):
+        kwargs.update(batch_size=batch_size, config=cls.create_config(image_size=size))
+    elif cls is DotSpan:
+        kwargs.update(batch_size=batch_size, rows=grid, cols=grid, subgrid=(grid // 2, grid // 2), image_size=size)
+    else:
+        kwargs.update(n_symm=batch_size - batch_size // 2, n_asymm=batch_size // 2, rows=grid, cols=grid,
+                      image_size=size)
+
+    return lambda sink: cls.create_batch(sink=sink, **kwargs)
+
+
+def create_cases(image_sizes=(1210,), grids=(8,), batch_sizes=(6,), names=None):
+    """
+    Lists all benchmark cases, one per primitive or paradigm and combination of parameters.
+
+    :param image_sizes: Image sizes to benchmark
+    :param grids: Grid sizes to benchmark
+    :param batch_sizes: Batch sizes of the paradigms
+    :param names: Names of the primitives and paradigms to benchmark, by default all
+    :returns: List of (name, parameters) pairs
+    """
+
+    cases = []
+    for name in PRIMITIVES:
+        for image_size in image_sizes:
+            for grid in grids:
+                cases.append((name, {"image_size": image_size, "grid": grid}))
+
+    for name in PARADIGMS:
+        for image_size in image_sizes:
+            for grid in grids:
+                for batch_size in batch_sizes:
+                    cases.append((name, {"image_size": image_size, "grid": grid, "batch_size": batch_size}))
+
+    if names:
+        cases = [(name, params) for name, params in cases if name in names]
+
+    return cases
+
+
+def _peak_memory():
+    # peak resident memory of this process in bytes, ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak
+    return peak * 1024
+
+
+def run_case(name, params, repeat=3):
+    """
+    Runs a benchmark case several times. Images are written to a temporary folder. Every run starts with empty caches
+    (see CACHES), like the first stimulus of a process.
+
+    :param name: Name of the primitive or paradigm
+    :param params: Parameters of the case (see create_cases)
+    :param repeat: Number of runs, the timings are medians over all runs
+    :returns: Result dict with the timings in seconds and the peak memory in bytes
+    """
+
+    if resource is None:
+        tracemalloc.start()
+    else:
+        memory_before = _peak_memory()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as root:
+        for folder in PARADIGMS:
+            os.mkdir(os.path.join(root, folder))
+
+        for _ in range(repeat):
+            if name in PARADIGMS:
+                case = paradigm_case(name, **params)
+            else:
+                case = primitive_case(name, params["image_size"], params["grid"])
+
+            sink = TimedSink(DirectorySink(root=f"{root}{os.sep}"))
+            clear_caches()
+            start = time.perf_counter()
+            case(sink)
+            total = time.perf_counter() - start
+
+            runs.append({"total": total, "render": total - sink.encode_time - sink.write_time,
+                         "encode": sink.encode_time, "write": sink.write_time,
+                         "bytes_written": sink.bytes_written, "files_written": sink.files_written})
+
+    if resource is None:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    else:
+        # increase of the peak over the memory the process needed before the case
+        peak_memory = _peak_memory() - memory_before
+
+    result = {"name": name, "params": params, "repeat": repeat, "peak_memory": peak_memory}
+    for key in ("total", "render", "encode", "write"):
+        result[key] = statistics.median(run[key] for run in runs)
+    for key in ("bytes_written", "files_written"):
+        result[key] = runs[-1][key]
+
+    return result
+
+
+def run_benchmarks(cases, repeat=3, isolate=True):
+    """
+    Runs all benchmark cases.
+
+    :param cases: List of (name, parameters) pairs (see create_cases)
+    :param repeat: Number of runs per case
+    :param isolate: Whether each case runs in a fresh process, so its peak memory is not hidden by earlier cases
+    :returns: List of result dicts (see run_case)
+    """
+
+    results = []
+    for name, params in cases:
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                result = executor.submit(run_case, name, params, repeat).result()
+        else:
+            result = run_case(name, params, repeat)
+
+        print(format_result(result))
+        results.append(result)
+
+    return results
+
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "pillow": PIL.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def case_key(result):
+    return result["name"], tuple(sorted(result["params"].items()))
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Compares results with those of a baseline run.
+
+    :param results: List of result dicts
+    :param baseline: List of result dicts of the baseline run
+    :param threshold: Allowed relative increase of time and memory, e.g. 0.2 for 20%
+    :returns: List of (result, metric, baseline value, new value) tuples, one per regression
+    """
+
+    baseline = {case_key(result): result for result in baseline}
+
+    regressions = []
+    for result in results:
+        old = baseline.get(case_key(result))
+        if old is None:
+            continue
+
+        for metric in ("total", "peak_memory"):
+            if result[metric] > old[metric] * (1 + threshold) and result[metric] > 0:
+                regressions.append((result, metric, old[metric], result[metric]))
+
+    return regressions
+
+
+def format_params(params):
+    return " ".join(f"{key}={value}" for key, value in params.items())
+
+
+def format_result(result):
+    return (f"{result['name']:<22} {format_params(result['params']):<38} total {result['total'] * 1000:9.2f} ms  "
+            f"render {result['render'] * 1000:9.2f} ms  encode {result['encode'] * 1000:9.2f} ms  "
+            f"write {result['write'] * 1000:8.2f} ms  memory {result['peak_memory'] / 2 ** 20:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the speed and memory use of the paradigms and the Canvas "
+                                                 "primitives.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1210],
+                        help="width and height of the images (default: 1210)")
+    parser.add_argument("--grids", type=int, nargs="+", default=[8],
+                        help="number of rows and columns of the grids (default: 8)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[6],
+                        help="number of stimuli (or sets) per paradigm batch (default: 6)")
+    parser.add_argument("--cases", nargs="+", default=None, choices=PRIMITIVES + tuple(PARADIGMS),
+                        help="primitives and paradigms to benchmark (default: all)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of runs per case, timings are medians (default: 3)")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="run all cases in this process, faster but the peak memory of a case includes the "
+                             "cases before it")
+    parser.add_argument("--output", default=None,
+                        help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None,
+                        help="JSON file of an earlier run to compare with, exits with status 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed relative increase of time and memory over the baseline (default: 0.2)")
+    args = parser.parse_args()
+
+    cases = create_cases(args.sizes, args.grids, args.batch_sizes, args.cases)
+    results = run_benchmarks(cases, repeat=args.repeat, isolate=not args.no_isolate)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"environment": environment(), "results": results}, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+
+        regressions = compare(results, baseline, threshold=args.threshold)
+        for result, metric, old, new in regressions:
+            print(f"Regression: {result['name']} {format_params(result['params'])} {metric} {old:.6g} -> {new:.6g}")
+
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions over {args.baseline}")
@@ -1,46 +1,152 @@
-from PIL import Image, ImageDraw, ImageFont, ImageOps
-from geometry import Vector, Point
+import zlib
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw
+
+from encoding import encode_image
+from geometry import Vector, Point, PointArray
+from glyphs import DEFAULT_FONT, glyph_layer, load_font
+from overlay import grid_layer, overlay_layer
+from sinks import DirectorySink
+
+# modes of canvases in automatic mode, each mode stores all colors of the modes before it
+MODES = ("1", "L", "RGB", "RGBA")
+
+
+def rgba(color):
+    """
+    :param color: Color as (r, g, b, a) or (r, g, b) tuple, gray value or color name
+    :returns: (r, g, b, a) tuple
+    """
+
+    if isinstance(color, str):
+        color = ImageColor.getrgb(color)
+    elif isinstance(color, (int, np.integer)):
+        color = (int(color),) * 3
+    color = tuple(color)
+
+    if len(color) == 3:
+        return color + (255,)
+    return color
+
+
+def fitting_mode(color):
+    """
+    :param color: Color (see rgba)
+    :returns: Smallest mode that stores the color without loss
+    """
+
+    r, g, b, a = rgba(color)
+    if a < 255:
+        return "RGBA"
+    if r == g == b:
+        return "1" if r in (0, 255) else "L"
+    return "RGB"
+
+
+def mode_color(color, mode):
+    """
+    Converts a color to the value drawing in an image of the given mode expects, the same way Image.convert converts
+    pixels.
+
+    :param color: Color (see rgba)
+    :param mode: Mode of the image
+    :returns: Gray value or tuple
+    """
+
+    if mode not in MODES:
+        return color
+
+    r, g, b, a = rgba(color)
+    if mode == "RGBA":
+        return r, g, b, a
+    if mode == "RGB":
+        return r, g, b
+
+    gray = r if r == g == b else (r * 19595 + g * 38470 + b * 7471 + 0x8000) >> 16
+    if mode == "1":
+        return 255 if gray >= 128 else 0
+    return gray
 
 
 class Canvas:
-    def __init__(self, size=(1210, 1210), mode="RGBA", background_color=(255, 255, 255, 255), name="canvas"):
+    def __init__(self, size=(1210, 1210), mode="auto", background_color=(255, 255, 255, 255), name="canvas"):
         self.width = int(size[0])
         self.height = int(size[1])
         self.size = (self.width, self.height)
-        self.mode = mode
         self.background_color = background_color
         self.name = name
 
+        # in automatic mode, the image starts in the smallest mode storing the background color and is promoted to a
+        # larger mode when a color or an operation needs it (see ink and promote)
+        self.auto_mode = mode == "auto"
+        if self.auto_mode:
+            mode = fitting_mode(background_color)
+        self.mode = mode
+
         self.center = Point(self.width / 2, self.height / 2)
 
         # Create a new blank image
-        self.image = Image.new(mode, self.size, background_color)
+        self.image = Image.new(mode, self.size, mode_color(background_color, mode))
 
         # Create a drawing object
         self.draw = ImageDraw.Draw(self.image, mode=mode)
 
+    def promote(self, mode):
+        """
+        Converts the image to a mode storing more colors, e.g. to "RGBA" before compositing transparent layers. Images
+        in the given mode or a larger one are kept. The image object is replaced.
+
+        :param mode: "1", "L", "RGB" or "RGBA"
+        :returns: None
+        """
+
+        if self.mode in MODES and MODES.index(self.mode) >= MODES.index(mode):
+            return
+        if self.mode not in MODES and mode != "RGBA":
+            return
+
+        self.image = self.image.convert(mode)
+        self.mode = mode
+        self.draw = ImageDraw.Draw(self.image, mode=mode)
+
+    def ink(self, color):
+        """
+        Converts a color to the value drawing in the image's mode expects. In automatic mode, the image is promoted to a
+        mode storing the color first, otherwise the color is converted like Image.convert converts pixels.
+
+        :param color: Color (see rgba)
+        :returns: Gray value or tuple
+        """
+
+        if self.auto_mode:
+            self.promote(fitting_mode(color))
+
+        return mode_color(color, self.mode)
+
     def draw_grid(self, rows=8, cols=8, color=(0, 0, 0, 255), line_thickness=None):
-        # draw lines between the rows and columns
-        if not line_thickness:
-            line_thickness = max(1, max(self.width, self.height) // 400) * 2
+        """
+        Draws lines between the rows and columns of a grid. The lines are rendered once per size, grid and thickness, and
+        afterwards only filled in with the color.
 
-        line_offset = Vector(line_thickness // 2, line_thickness // 2)
+        :param rows: Number of rows
+        :param cols: Number of columns
+        :param color: Color of the lines
+        :param line_thickness: Thickness of the lines
+        :returns: None
+        """
 
-        # how many pixels high/wide the rows/columns are
-        col_step = self.width / cols
-        row_step = self.height / rows
+        if not line_thickness:
+            line_thickness = max(1, max(self.width, self.height) // 400) * 2
 
-        for row in range(rows + 1):
-            y = row * row_step
-            start = Point(0, y) - line_offset
-            end = Point(self.width + line_thickness, y) - line_offset
-            self.draw.line([start, end], fill=color, width=line_thickness)
+        color = self.ink(color)
+        boxes, mask = grid_layer(self.size, rows, cols, line_thickness)
+        if boxes is None:
+            self.image.paste(color, (0, 0), mask)
+            return
 
-        for col in range(cols + 1):
-            x = col * col_step
-            start = Point(x, 0) - line_offset
-            end = Point(x, self.height + line_thickness) - line_offset
-            self.draw.line([start, end], fill=color, width=line_thickness)
+        for box in boxes:
+            self.image.paste(color, box)
 
     def draw_arrow(self, start, end, color=(0, 0, 0, 255), line_thickness=None, tip_width=None, tip_length=None):
         """
@@ -55,6 +161,22 @@ class Canvas:
         :returns: None
         """
 
+        self.draw_arrows([start], [end], color=color, line_thickness=line_thickness, tip_width=tip_width,
+                         tip_length=tip_length)
+
+    def draw_arrows(self, starts, ends, color=(0, 0, 0, 255), line_thickness=None, tip_width=None, tip_length=None):
+        """
+        Draws arrows from each start to the corresponding end. The geometry of all arrows is calculated at once.
+
+        :param starts: Points (or a PointArray) where the arrows start
+        :param ends: Points (or a PointArray) where the arrows end
+        :param color: Color of the arrows
+        :param line_thickness: Thickness of the arrows' lines
+        :param tip_width: Width of the base of the triangular tips
+        :param tip_length: Distance from the base of the triangular tips to the ends of the arrows
+        :returns: None
+        """
+
         # Calculate default values
         if not line_thickness:
             line_thickness = max(1, max(self.width, self.height) // 100) * 2
@@ -63,19 +185,23 @@ class Canvas:
         if not tip_length:
             tip_length = tip_width*0.6
 
-        start = Point(*start)
-        tip = Point(*end)
-        direction = (tip - start).normalize()
-        line_end = tip - tip_length * direction
+        starts = PointArray(starts.xy if isinstance(starts, PointArray) else starts)
+        tips = PointArray(ends.xy if isinstance(ends, PointArray) else ends)
+        directions = (tips - starts).normalize()
+        line_ends = tips - tip_length * directions
+
+        left = directions.perpendicular_counterclockwise()
+        right = directions.perpendicular_clockwise()
 
-        left = direction.perpendicular_counterclockwise()
-        right = direction.perpendicular_clockwise()
+        left_corners = line_ends + (tip_width / 2) * left
+        right_corners = line_ends + (tip_width / 2) * right
 
-        left_corner = line_end + (tip_width / 2) * left
-        right_corner = line_end + (tip_width / 2) * right
+        color = self.ink(color)
 
-        self.draw.polygon([left_corner, tip, right_corner], fill=color, outline=None, width=0)
-        self.draw.line([start, line_end], fill=color, width=line_thickness)
+        for start, tip, line_end, left_corner, right_corner in zip(starts, tips, line_ends, left_corners,
+                                                                   right_corners):
+            self.draw.polygon([left_corner, tip, right_corner], fill=color, outline=None, width=0)
+            self.draw.line([start, line_end], fill=color, width=line_thickness)
 
     def draw_radial_arrow(self, angle=0, length=None, color=(0, 0, 0, 255), line_thickness=None, tip_width=None,
                           tip_length=None):
@@ -102,6 +228,18 @@ class Canvas:
         self.draw_arrow(start=self.center, end=end, color=color, line_thickness=line_thickness,
                         tip_width=tip_width, tip_length=tip_length)
 
+    def cell_centers(self, rows, cols, cells=None):
+        """
+        Calculates the centers of cells of a grid covering the image.
+
+        :param rows: Number of rows
+        :param cols: Number of columns
+        :param cells: Array of (row, col) pairs, by default all cells in row-major order
+        :returns: PointArray
+        """
+
+        return PointArray.cell_centers(self.width, self.height, rows, cols, cells)
+
     def draw_dot(self, center=None, radius=None, color=(0, 0, 0, 255)):
         if not center:
             center = self.center
@@ -113,6 +251,8 @@ class Canvas:
         top_left = center + radius*Vector.up() + radius*Vector.left()
         bottom_right = center + radius*Vector.down() + radius*Vector.right()
 
+        # ink may replace the image, so it is converted before the drawing method is looked up
+        color = self.ink(color)
         self.draw.ellipse([top_left, bottom_right], fill=color, outline=None, width=0)
 
     def draw_square(self, position=None, side_length=None, color=(0, 0, 0, 255)):
@@ -126,33 +266,52 @@ class Canvas:
         top_left = position + (side_length / 2) * Vector.up() + (side_length / 2) * Vector.left()
         bottom_right = position + (side_length / 2) * Vector.down() + (side_length / 2) * Vector.right()
 
+        color = self.ink(color)
         self.draw.rectangle([top_left, bottom_right], fill=color, width=0)
 
     def draw_letter(self, letter="A", location=None, color=(0, 0, 0, 255), mirror=False, angle=0, font=None, size=None):
+        """
+        Draws a letter, mirrored at the vertical center line of the image and rotated about the image's center.
+
+        :param letter: Letter to draw
+        :param location: Position of the letter's center before mirroring and rotating
+        :param color: Color of the letter
+        :param mirror: Whether the letter is mirrored
+        :param angle: Angle of the rotation (counterclockwise)
+        :param font: FreeTypeFont or path of a font file
+        :param size: Font size, only used if font is a path
+        :returns: None
+        """
+
         if not location:
             location = self.center
         if not size:
             size = min(self.width, self.height) // 3
         if not font:
-            font = ImageFont.truetype("fonts/ARIAL.TTF", size)
-
-        letter_image = Image.new(mode="RGBA", size=self.size, color=(255, 255, 255, 0))
-        letter_draw = ImageDraw.Draw(letter_image)
-        letter_draw.text(location, letter, fill=color, font=font, anchor="mm")
-
-        if mirror:
-            letter_image = ImageOps.mirror(letter_image)
-        letter_image = letter_image.rotate(angle)
-
-        self.image = Image.alpha_composite(self.image, letter_image)
-
-    def save(self, path="", name_overwrite=None, extension="png"):
+            font = DEFAULT_FONT
+        if isinstance(font, str):
+            font = load_font(font, size)
+
+        glyph = glyph_layer(letter, font, rgba(color), mirror, angle, self.size, tuple(location))
+        if glyph:
+            # the edges of the letter are blended with the background
+            self.promote("RGBA")
+            letter_image, dest = glyph
+            self.image.alpha_composite(letter_image, dest=dest)
+
+    def save(self, path="", name_overwrite=None, extension="png", sink=None, depth="auto", compress_level=None,
+             optimize=False):
         """
-        Saves the image using the name and the given filename extension.
+        Saves the image using the name and the given filename extension. By default, the image is stored with the
+        smallest color depth that keeps it unchanged, e.g. as 1-bit PNG if it is black and white.
 
         :param path: Path where the file should be saved
         :param extension: Filename extension.
         :param name_overwrite: Filename to use instead of the name of the canvas.
+        :param sink: Sink to save to (see sinks.py), by default the file is written directly
+        :param depth: Color depth of the file, "auto", None to keep the image's mode, or a mode like "1", "L" or "P"
+        :param compress_level: zlib compression level of PNG files (0-9), or effort of (lossless) WebP compression (0-6)
+        :param optimize: Whether the encoder searches for the smallest file, which takes longer
         :returns: None
         """
 
@@ -161,7 +320,24 @@ class Canvas:
         else:
             name = name_overwrite
 
-        self.image.save(f"{path}{name}.{extension}")
+        if sink is None:
+            sink = DirectorySink()
+
+        sink.save(self.image, f"{path}{name}.{extension}", extension, depth=depth, compress_level=compress_level,
+                  optimize=optimize)
+
+    def encode(self, extension="png", depth="auto", compress_level=None, optimize=False):
+        """
+        Encodes the image in memory, producing the same bytes as saving it with the given extension and options.
+
+        :param extension: Filename extension determining the image format.
+        :param depth: Color depth of the encoded image (see save)
+        :param compress_level: Compression level (see save)
+        :param optimize: Whether the encoder searches for the smallest encoding
+        :returns: Encoded image as bytes
+        """
+
+        return encode_image(self.image, extension, depth=depth, compress_level=compress_level, optimize=optimize)
 
     def show(self):
         """
@@ -172,22 +348,63 @@ class Canvas:
 
         self.image.show()
 
-    def draw_checker_pattern(self, color=(100, 100, 100, 100)):
+    def draw_overlay(self, pattern="checker", color=(100, 100, 100, 100), box=None, **params):
+        """
+        Draws a transparent periodic pattern over the image. The pattern is aligned to the full image, so overlays
+        restricted to neighbouring boxes line up.
+
+        :param pattern: Name of the pattern ("checker", "stripes" or "dither")
+        :param color: Color of the pattern
+        :param box: Region (left, top, right, bottom) the overlay is restricted to, the whole image by default
+        :param params: Parameters of the pattern, e.g. the cell size of a checkerboard (see overlay.py)
+        :returns: None
+        """
+
+        if not box:
+            box = (0, 0, self.width, self.height)
+        left, top = max(0, int(box[0])), max(0, int(box[1]))
+        right, bottom = min(self.width, int(box[2])), min(self.height, int(box[3]))
+        if right <= left or bottom <= top:
+            return
+
+        layer = overlay_layer(pattern, (right - left, bottom - top), rgba(color), offset=(left, top), **params)
+        self.promote("RGBA")
+        self.image.alpha_composite(layer, dest=(left, top))
+
+    def draw_checker_pattern(self, color=(100, 100, 100, 100), box=None):
         """
         Draws a transparent checkerboard pattern over the image.
         """
 
-        checker_image = Image.new(mode="RGBA", size=self.size, color=(255, 255, 255, 0))
-        checker_draw = ImageDraw.Draw(checker_image)
+        self.draw_overlay("checker", color=color, box=box)
 
-        for x in range(self.width):
-            for y in range(self.height):
-                if x % 2 == 0 and y % 2 == 0:
-                    checker_draw.point((x, y), fill=color)
-                elif x % 2 == 1 and y % 2 == 1:
-                    checker_draw.point((x, y), fill=color)
+    @classmethod
+    def seed_random(cls, seed, index):
+        """
+        Seeds numpy's global random state for a single stimulus (or set) of a batch. The state only depends on the
+        root seed, the paradigm and the index, so stimuli can be generated in any order and in separate processes.
+
+        :param seed: Root seed of the batch
+        :param index: Index of the stimulus within the batch
+        :returns: None
+        """
+
+        paradigm = zlib.crc32(cls.__name__.encode())
+        np.random.seed(np.random.SeedSequence(seed, spawn_key=(paradigm, index)).generate_state(4))
+
+    @classmethod
+    def seed_batch(cls, seed):
+        """
+        Seeds numpy's global random state for draws shared by all stimuli of a batch, e.g. patterns that have to be
+        distinct. The state only depends on the root seed and the paradigm, and differs from the states of the single
+        stimuli (see seed_random), so every job of a batch can repeat the draws.
+
+        :param seed: Root seed of the batch
+        :returns: None
+        """
 
-        self.image = Image.alpha_composite(self.image, checker_image)
+        paradigm = zlib.crc32(cls.__name__.encode())
+        np.random.seed(np.random.SeedSequence(seed, spawn_key=(paradigm,)).generate_state(4))
 
     def __repr__(self):
         return f"{self.name}({type(self)})"
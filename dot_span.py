@@ -1,113 +1,143 @@
 from canvas import Canvas
 import numpy as np
 
-from geometry import Point
+from frames import FrameRenderer, ellipse_sprite
+from patterns import draw_unique
+from sampling import corners, max_cells, random_starts, region_masks, sample_cells
+from scene import Scene, save_scenes, size_folder
 
 
 class DotSpan(Canvas):
-    def __init__(self, size=(1210, 1210), mode="RGBA", background_color=(255, 255, 255, 255), name="arrow_span"):
+    def __init__(self, size=(1210, 1210), mode="auto", background_color=(255, 255, 255, 255), name="arrow_span"):
         super(DotSpan, self).__init__(size=size, mode=mode, background_color=background_color, name=name)
 
         self.dots = None
         self.rows = None
         self.cols = None
 
-    def configure_dots(self, rows=10, cols=10, n=6, subgrid=None, exclude_corners=True):
+    def configure_dots(self, rows=10, cols=10, n=6, subgrid=None, exclude_corners=True, index=None):
         self.rows = rows
         self.cols = cols
-        self.dots = np.zeros((rows, cols))
+        self.dots = draw_unique(lambda: self.generate_patterns(1, rows=rows, cols=cols, n=n, subgrid=subgrid,
+                                                               exclude_corners=exclude_corners)[0], index)
+
+    @staticmethod
+    def generate_patterns(count, rows=10, cols=10, n=6, subgrid=None, exclude_corners=True):
+        """
+        Generates many dot patterns at once. The dots of each pattern are drawn without replacement from the cells of a
+        randomly placed subgrid, or of the whole grid, leaving out the grid's corners.
+
+        :param count: Number of patterns
+        :param rows: Number of rows of each pattern
+        :param cols: Number of columns of each pattern
+        :param n: Number of dots of each pattern
+        :param subgrid: Number of rows and columns of the subgrid, by default the whole grid is used
+        :param exclude_corners: Whether the corners of the grid are left out
+        :returns: Array of zeros and ones with shape (count, rows, cols)
+        """
 
         if not subgrid:
-            subgrid = (rows, cols)
-            start = (0, 0)
-        elif subgrid[0] <= rows and subgrid[1] <= cols:
-            max_row_idx = rows - subgrid[0] + 1
-            max_col_idx = cols - subgrid[1] + 1
-            start = (np.random.randint(0, max_col_idx), np.random.randint(0, max_row_idx))
+            starts = np.zeros((count, 2), dtype=int)
         else:
-            raise ValueError("Subgrid is too big!")
+            starts = random_starts(count, rows, cols, subgrid)
 
-        if exclude_corners:
-            exclude = [(0, 0), (rows - 1, 0), (0, cols - 1), (rows - 1, cols - 1)]
-        else:
-            exclude = None
+        exclude = corners(rows, cols) if exclude_corners else None
+        cells = sample_cells(region_masks(rows, cols, starts, subgrid, exclude), n)
 
-        coords = self.generate_random_coords(n=n, rows=subgrid[0], cols=subgrid[1], start=start, exclude=exclude)
+        dots = np.zeros((count, rows * cols))
+        np.put_along_axis(dots, cells, 1, axis=1)
 
-        for coord in coords:
-            self.dots[coord[0]][coord[1]] = 1
+        return dots.reshape(count, rows, cols)
 
     @staticmethod
     def generate_random_coords(n, rows, cols, start=(0, 0), exclude=None):
-        coords = []
-
-        if not exclude:
-            exclude = []
-
-        row_low = start[0]
-        row_high = start[0] + cols
-        col_low = start[1]
-        col_high = start[1] + rows
-
-        max_iter = (rows * cols) * 100
-        for i in range(n):
-            row, col = np.random.randint(row_low, row_high), np.random.randint(col_low, col_high)
-            i = 0
-            while (row, col) in coords or (row, col) in exclude:
-                i += 1
-                if i > max_iter:
-                    raise StopIteration("Maximum number of iterations exceeded.")
-                row, col = np.random.randint(row_low, row_high), np.random.randint(col_low, col_high)
+        # n different cells of the rows x cols region starting at the start cell, as a list of (row, col) pairs
+        grid_rows = start[0] + rows
+        grid_cols = start[1] + cols
+        exclude = [(row, col) for row, col in exclude or () if 0 <= row < grid_rows and 0 <= col < grid_cols]
 
-            coords.append((row, col))
+        cells = sample_cells(region_masks(grid_rows, grid_cols, [start], (rows, cols), exclude), n)[0]
 
-        return coords
+        return list(zip(*(index.tolist() for index in np.unravel_index(cells, (grid_rows, grid_cols)))))
 
     def draw_dots(self, color=(0, 0, 0, 255)):
-        # how many pixels high/wide the rows/columns are
-        col_step = self.width / self.cols
+        # how many pixels high the rows are
         row_step = self.height / self.rows
+        radius = row_step / 2
 
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if self.dots[row][col] == 1:
-                    center = Point((col * col_step) + (col_step / 2), (row * row_step) + (row_step / 2))
-                    radius = row_step / 2
-                    self.draw_dot(center=center, radius=radius, color=color)
+        for center in self.cell_centers(self.rows, self.cols, np.argwhere(self.dots == 1)):
+            self.draw_dot(center=center, radius=radius, color=color)
 
-    def draw_dots_one_by_one(self, color=(0, 0, 0, 255), line_color=None, path="", name=None, keep_dots=False):
+    def draw_dots_one_by_one(self, color=(0, 0, 0, 255), line_color=None, path="", name=None, keep_dots=False,
+                             sink=None, save_options=None):
         if not name:
             name = self.name
+        if save_options is None:
+            save_options = {}
 
-        # how many pixels high/wide the rows/columns are
-        col_step = self.width / self.cols
+        # how many pixels high the rows are
         row_step = self.height / self.rows
+        radius = row_step / 2
 
         if not line_color:
             line_color = color
         self.draw_grid(color=line_color)
+        color = self.ink(color)
+
+        # the grid is the static base of all frames, only the area of the previous dot is restored between frames
+        frames = FrameRenderer(self.image)
+
+        centers = self.cell_centers(self.rows, self.cols, np.argwhere(self.dots == 1))
+        boxes = np.column_stack((centers.xy - radius, centers.xy + radius)).tolist()
+        for i, box in enumerate(boxes, 1):
+            mask, position = ellipse_sprite(tuple(box))
+            frames.paste(color, mask, position)
+            self.save(path=path, name_overwrite=f"{name}_dot{i}", sink=sink, **save_options)
+            if not keep_dots:
+                frames.restore()
+
+    def frame_scenes(self, color=(0, 0, 0, 255), line_color=None, path="", name=None, keep_dots=False):
+        # the frames of draw_dots_one_by_one as (filename, scene) pairs
+        if not name:
+            name = self.name
+        if not line_color:
+            line_color = color
+
+        scenes = []
+        frame_dots = np.zeros_like(self.dots)
+        for i, cell in enumerate(np.argwhere(self.dots == 1), 1):
+            if not keep_dots:
+                frame_dots = np.zeros_like(self.dots)
+            frame_dots[tuple(cell)] = 1
 
-        i = 1
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if self.dots[row][col] == 1:
-                    center = Point((col * col_step) + (col_step / 2), (row * row_step) + (row_step / 2))
-                    radius = row_step / 2
-                    self.draw_dot(center=center, radius=radius, color=color)
-                    self.save(path=path, name_overwrite=f"{name}_dot{i}")
-                    if not keep_dots:
-                        self.draw_square(position=center, side_length=radius*2, color=self.background_color)
-                        self.draw_grid(color=line_color)
-                    i += 1
+            frame = Scene(type(self), self.size, name=f"{name}_dot{i}", background_color=self.background_color,
+                          state={"rows": self.rows, "cols": self.cols, "dots": frame_dots.copy()})
+            frame.add("draw_grid", color=line_color)
+            frame.add("draw_dots", color=color)
+            scenes.append((f"{path}{name}_dot{i}", frame))
+
+        return scenes
 
     def draw_grid(self, rows=None, cols=None, color=(0, 0, 0, 255), line_thickness=None):
         super(DotSpan, self).draw_grid(rows=self.rows, cols=self.cols, color=color)
 
     @classmethod
-    def create_batch(cls, batch_size=30, set_sizes=(2, 3, 4, 5, 6), rows=10, cols=10, subgrid=(5, 5),
-                     folder="dot_span/", image_size=(1210, 1210),
-                     background_color=(255, 255, 255, 255), dot_color=(0, 0, 0, 255), line_color=(0, 0, 0, 255)):
-        for i in range(batch_size):
+    def create_stimuli(cls, batch_size=30, set_sizes=(2, 3, 4, 5, 6), rows=10, cols=10, subgrid=(5, 5),
+                       image_size=(1210, 1210), background_color=(255, 255, 255, 255), seed=None, indices=None,
+                       index=None):
+        # configured but not yet drawn stimuli of a batch
+        if indices is None:
+            indices = range(batch_size)
+
+        # fail before the first stimulus rather than in the middle of the batch
+        available = min(max_cells(rows, cols, size, corners(rows, cols)) for size in (subgrid, None))
+        if max(set_sizes) > available:
+            raise ValueError(f"Can't place {max(set_sizes)} dots, only {available} cells are available!")
+
+        for i in indices:
+            if seed is not None:
+                cls.seed_random(seed, i)
+
             use_subgrid = np.random.randint(0, 2)
             if use_subgrid:
                 _subgrid = subgrid
@@ -117,5 +147,43 @@ class DotSpan(Canvas):
             set_size = set_sizes[i % len(set_sizes)]
 
             stimulus = cls(size=image_size, background_color=background_color, name=f"pattern{i}")
-            stimulus.configure_dots(rows=rows, cols=cols, n=set_size, subgrid=_subgrid)
-            stimulus.draw_dots_one_by_one(color=dot_color, line_color=line_color, path=folder)
+            stimulus.configure_dots(rows=rows, cols=cols, n=set_size, subgrid=_subgrid, index=index)
+            yield stimulus
+
+    @classmethod
+    def create_scenes(cls, batch_size=30, set_sizes=(2, 3, 4, 5, 6), rows=10, cols=10, subgrid=(5, 5),
+                      folder="dot_span/", image_size=(1210, 1210),
+                      background_color=(255, 255, 255, 255), dot_color=(0, 0, 0, 255), line_color=(0, 0, 0, 255),
+                      seed=None, indices=None, index=None):
+        for stimulus in cls.create_stimuli(batch_size=batch_size, set_sizes=set_sizes, rows=rows, cols=cols,
+                                           subgrid=subgrid, image_size=image_size, background_color=background_color,
+                                           seed=seed, indices=indices, index=index):
+            yield from stimulus.frame_scenes(color=dot_color, line_color=line_color, path=folder)
+
+    @classmethod
+    def create_batch(cls, batch_size=30, set_sizes=(2, 3, 4, 5, 6), rows=10, cols=10, subgrid=(5, 5),
+                     folder="dot_span/", image_size=(1210, 1210),
+                     background_color=(255, 255, 255, 255), dot_color=(0, 0, 0, 255), line_color=(0, 0, 0, 255),
+                     seed=None, indices=None, sink=None, save_options=None, image_sizes=None, supersample=1,
+                     index=None):
+        stimuli = cls.create_stimuli(batch_size=batch_size, set_sizes=set_sizes, rows=rows, cols=cols, subgrid=subgrid,
+                                     image_size=image_size, background_color=background_color, seed=seed,
+                                     indices=indices, index=index)
+
+        for stimulus in stimuli:
+            # supersampled frames are drawn from scenes, otherwise only the dot changes between the frames of a size
+            if supersample > 1:
+                save_scenes(stimulus.frame_scenes(color=dot_color, line_color=line_color, path=folder),
+                            sizes=image_sizes, sink=sink, supersample=supersample, save_options=save_options)
+                continue
+
+            if image_sizes is None:
+                stimulus.draw_dots_one_by_one(color=dot_color, line_color=line_color, path=folder, sink=sink,
+                                              save_options=save_options)
+                continue
+
+            for size in image_sizes:
+                resized = cls(size=size, background_color=background_color, name=stimulus.name)
+                resized.rows, resized.cols, resized.dots = stimulus.rows, stimulus.cols, stimulus.dots
+                resized.draw_dots_one_by_one(color=dot_color, line_color=line_color,
+                                             path=f"{size_folder(size)}{folder}", sink=sink, save_options=save_options)
@@ -0,0 +1,105 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+BLACK_AND_WHITE = {(0, 0, 0), (255, 255, 255)}
+
+
+def reduce_depth(image, depth="auto"):
+    """
+    Converts an image to the given color depth. With "auto", the smallest mode that stores the image without loss is
+    chosen: "1" for black and white, "L" for grays, "P" for up to 256 colors and "RGB" for opaque images. Images with
+    transparency are kept as they are.
+
+    :param image: Image to convert
+    :param depth: Mode to convert to, "auto" or None to keep the image's mode
+    :returns: Converted image
+    """
+
+    if not depth:
+        return image
+    if depth != "auto":
+        if depth == "1":
+            return image.convert("1", dither=Image.Dither.NONE)
+        return image.convert(depth)
+
+    if image.mode in ("1", "P"):
+        return image
+    if image.mode not in ("L", "RGB", "RGBA"):
+        return image
+
+    colors = image.getcolors(256)
+    if image.mode == "L":
+        if colors and {color for count, color in colors} <= {0, 255}:
+            return image.convert("1", dither=Image.Dither.NONE)
+        return image
+
+    if image.mode == "RGBA":
+        if image.getextrema()[3][0] < 255:
+            return image
+        if colors is None:
+            return image.convert("RGB")
+    elif colors is None:
+        return image
+
+    rgb_colors = {color[:3] for count, color in colors}
+    if rgb_colors <= BLACK_AND_WHITE:
+        return image.convert("1", dither=Image.Dither.NONE)
+    if all(r == g == b for r, g, b in rgb_colors):
+        return image.convert("L")
+
+    return _palette_image(image, sorted(rgb_colors))
+
+
+def _palette_image(image, colors):
+    # exact palette image, the adaptive quantizers of Pillow don't guarantee to keep all colors
+    pixels = np.asarray(image)[..., :3].astype(np.uint32)
+    keys = (pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]
+    palette_keys = np.array([(r << 16) | (g << 8) | b for r, g, b in colors], dtype=np.uint32)
+
+    indices = np.searchsorted(palette_keys, keys).astype(np.uint8)
+    palette_image = Image.fromarray(indices, mode="P")
+    palette_image.putpalette([channel for color in colors for channel in color])
+
+    return palette_image
+
+
+def encode_image(image, extension="png", depth="auto", compress_level=None, optimize=False):
+    """
+    Encodes an image in memory, producing the same bytes as saving it to a file with the given extension and options.
+    WebP images are always encoded losslessly.
+
+    :param image: Image to encode
+    :param extension: Filename extension determining the image format.
+    :param depth: Color depth of the encoded image (see reduce_depth)
+    :param compress_level: zlib compression level of PNG images (0-9), or effort of WebP compression (0-6)
+    :param optimize: Whether the encoder searches for the smallest encoding, which takes longer
+    :returns: Encoded image as bytes
+    """
+
+    image_format = Image.registered_extensions()[f".{extension}"]
+
+    params = {}
+    if image_format == "PNG":
+        image = reduce_depth(image, depth)
+        params["optimize"] = optimize
+        if compress_level is not None:
+            params["compress_level"] = compress_level
+    elif image_format == "WEBP":
+        # WebP only stores RGB(A), the alpha channel is dropped if the image is opaque
+        if depth and image.mode == "RGBA" and image.getextrema()[3][0] == 255:
+            image = image.convert("RGB")
+        params["lossless"] = True
+        params["exact"] = True
+        if compress_level is not None:
+            params["method"] = compress_level
+        if optimize:
+            params["quality"] = 100
+    elif depth != "auto":
+        image = reduce_depth(image, depth)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **params)
+
+    return buffer.getvalue()
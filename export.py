@@ -0,0 +1,159 @@
+import csv
+import inspect
+import os
+
+import numpy as np
+
+from arrow_span import ArrowSpan
+from batch import batch_length
+from dot_span import DotSpan
+from patterns import pack
+from pools import ByteCache, DEFAULT_BUDGET
+from rotation_span import RotationSpan
+from symmetry_span import SymmetrySpan
+
+# modes of exported images, the tensor gets a channel axis for modes with several bands
+MODES = ("L", "RGB", "RGBA")
+
+
+def arguments_of(method, kwargs):
+    # the arguments of a create_batch call that method takes
+    parameters = inspect.signature(method).parameters
+    return {key: value for key, value in kwargs.items() if key in parameters}
+
+
+def arrow_items(kwargs, indices):
+    arrows = ArrowSpan.create_all_arrows(kwargs.get("config"))
+    for index in indices:
+        scenes = ArrowSpan.create_scenes(**dict(arguments_of(ArrowSpan.create_scenes, kwargs), indices=[index],
+                                                arrows=arrows))
+        for item, (name, scene) in enumerate(scenes):
+            arguments = scene.operations[0][1]
+            yield [scene], {"set": index, "item": item, "name": name, "angle": arguments["angle"],
+                            "length": arguments["length"]}
+
+
+def letter_items(kwargs, indices):
+    letters = RotationSpan.create_all_letters(kwargs.get("config"))
+    for index in indices:
+        scenes = RotationSpan.create_scenes(**dict(arguments_of(RotationSpan.create_scenes, kwargs), indices=[index],
+                                                   letters=letters))
+        for item, (name, scene) in enumerate(scenes):
+            arguments = scene.operations[0][1]
+            yield [scene], {"set": index, "item": item, "name": name, "letter": arguments["letter"],
+                            "angle": arguments["angle"], "mirror": int(arguments["mirror"])}
+
+
+def dot_items(kwargs, indices):
+    folder = kwargs.get("folder", "dot_span/")
+    for index in indices:
+        stimulus, = DotSpan.create_stimuli(**dict(arguments_of(DotSpan.create_stimuli, kwargs), indices=[index]))
+        frames = stimulus.frame_scenes(color=kwargs.get("dot_color", (0, 0, 0, 255)),
+                                       line_color=kwargs.get("line_color", (0, 0, 0, 255)), path=folder)
+        # the frames show the dots in this order
+        dots = " ".join(f"{row}:{col}" for row, col in np.argwhere(stimulus.dots == 1).tolist())
+        yield [scene for _, scene in frames], {"set": index, "item": 0, "name": f"{folder}{stimulus.name}",
+                                               "frames": len(frames), "dots": dots}
+
+
+def symmetry_items(kwargs, indices):
+    n_symm = kwargs.get("n_symm", 6)
+    for index in indices:
+        (name, scene), = SymmetrySpan.create_scenes(**dict(arguments_of(SymmetrySpan.create_scenes, kwargs),
+                                                           indices=[index]))
+        squares = scene.state["squares"]
+        yield [scene], {"set": index, "item": 0, "name": name, "symmetric": int(index < n_symm),
+                        "squares": f"{pack(squares)[0]:x}"}
+
+
+# functions listing the images of a batch: pairs of the scenes of a row (several frames for DotSpan) and its metadata
+ITEMS = {ArrowSpan: arrow_items, RotationSpan: letter_items, DotSpan: dot_items, SymmetrySpan: symmetry_items}
+
+
+def metadata_path(path):
+    return f"{os.path.splitext(path)[0]}.csv"
+
+
+def export_batch(cls, path, size=None, mode="L", supersample=1, budget=DEFAULT_BUDGET, **kwargs):
+    """
+    Draws the batch of a paradigm straight into a memory-mapped .npy tensor instead of image files, and writes a table
+    describing each row to a CSV file next to it (see load_export). The tensor has the shape (N, H, W), or
+    (N, frames, H, W) for the frame sequences of DotSpan, with a trailing channel axis for RGB and RGBA. Frames beyond
+    the number of dots of a stimulus are zero.
+
+    The metadata has the columns row, set, item and name (the filename the stimulus is saved to without extension), and:
+
+    - ArrowSpan: angle, length
+    - RotationSpan: letter, angle, mirror
+    - DotSpan: frames, dots (row:col of each dot, in the order of the frames)
+    - SymmetrySpan: symmetric, squares (the grid packed by patterns.pack, hexadecimal)
+
+    :param cls: Paradigm class
+    :param path: Path of the .npy file
+    :param size: Size (width, height) of the images, by default the paradigm's size
+    :param mode: Mode of the images, "L", "RGB" or "RGBA"
+    :param supersample: See Scene.render
+    :param budget: Bytes of drawn images kept for members of stimulus pools appearing in several sets
+    :param kwargs: Arguments of create_batch, e.g. seed and indices
+    :returns: Pair of the tensor (opened read-only) and the metadata as a list of dicts
+    """
+
+    if mode not in MODES:
+        raise ValueError(f"Can't export {mode} images, use one of {', '.join(MODES)}!")
+
+    indices = kwargs.pop("indices", None)
+    if indices is None:
+        indices = range(batch_length(cls, **kwargs))
+
+    # the scenes are only described here, they are drawn while the tensor is filled
+    rows = list(ITEMS[cls](kwargs, indices))
+
+    if size is None:
+        size = rows[0][0][0].size if rows else (1210, 1210)
+    frames = max((len(scenes) for scenes, _ in rows), default=1)
+
+    shape = (len(rows),) + ((frames,) if cls is DotSpan else ()) + (size[1], size[0])
+    if len(mode) > 1:
+        shape += (len(mode),)
+
+    tensor = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=shape)
+    images = ByteCache(budget)
+    for row, (scenes, metadata) in enumerate(rows):
+        for frame, scene in enumerate(scenes):
+            if scene in images:
+                image = images[scene]
+            else:
+                image = scene.render(size, supersample=supersample).image.convert(mode)
+                images[scene] = image
+
+            if cls is DotSpan:
+                tensor[row, frame] = np.asarray(image)
+            else:
+                tensor[row] = np.asarray(image)
+        metadata["row"] = row
+
+    tensor.flush()
+    del tensor
+
+    table = [metadata for _, metadata in rows]
+    fields = ["row"] + [key for key in (table[0] if table else {}) if key != "row"]
+    with open(metadata_path(path), "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(table)
+
+    return load_export(path)
+
+
+def load_export(path):
+    """
+    Opens a tensor written by export_batch without reading it into memory, together with its metadata.
+
+    :param path: Path of the .npy file
+    :returns: Pair of the read-only memory-mapped tensor and the metadata as a list of dicts (with string values)
+    """
+
+    with open(metadata_path(path), newline="") as file:
+        table = list(csv.DictReader(file))
+
+    return np.load(path, mmap_mode="r"), table
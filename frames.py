@@ -0,0 +1,70 @@
+import math
+from functools import lru_cache
+
+from PIL import Image, ImageDraw
+
+
+@lru_cache(maxsize=64)
+def _ellipse_mask(left, top, width, height):
+    size = (max(1, math.ceil(left + width) + 1), max(1, math.ceil(top + height) + 1))
+    mask = Image.new(mode="L", size=size, color=0)
+    ImageDraw.Draw(mask).ellipse([left, top, left + width, top + height], fill=255)
+
+    return mask
+
+
+def ellipse_sprite(box):
+    """
+    Returns a mask of a filled ellipse, matching ImageDraw.ellipse for the given box. Masks are cached by the box's
+    size and its position relative to the pixel grid, so an ellipse is only rasterized once for all cells of a grid.
+
+    :param box: Bounding box (left, top, right, bottom) of the ellipse
+    :returns: Mask ("L" image, must not be modified) and the position (left, top) to paste it at
+    """
+
+    # coordinates are not rounded consistently below zero, boxes starting outside the image are not shifted
+    left, top = max(0, math.floor(box[0])), max(0, math.floor(box[1]))
+    mask = _ellipse_mask(box[0] - left, box[1] - top, box[2] - box[0], box[3] - box[1])
+
+    return mask, (left, top)
+
+
+class FrameRenderer:
+    """
+    Renders a sequence of frames that consist of a static base image and a few sprites. The base is copied once,
+    sprites are pasted onto the image, and only the rectangles they covered are restored from the base afterwards.
+    """
+
+    def __init__(self, image):
+        """
+        :param image: Image the frames are rendered on, its current content is used as the base
+        """
+
+        self.image = image
+        self.base = image.copy()
+        self.dirty = []
+
+    def paste(self, color, mask, position):
+        """
+        Fills the pixels of the mask with the given color.
+
+        :param color: Color of the sprite
+        :param mask: Mask of the sprite
+        :param position: Position (left, top) of the sprite's mask
+        :returns: None
+        """
+
+        box = (position[0], position[1], position[0] + mask.width, position[1] + mask.height)
+        self.image.paste(color, box, mask)
+        self.dirty.append(box)
+
+    def restore(self):
+        """
+        Restores the base image where sprites were pasted since the last restore.
+
+        :returns: None
+        """
+
+        for box in self.dirty:
+            self.image.paste(self.base.crop(box), box)
+        self.dirty = []
@@ -1,33 +1,40 @@
 import math
+from operator import itemgetter
+
+import numpy as np
 
 
 class Vector(tuple):
+    # no instance dictionary, the coordinates live in the tuple itself
+    __slots__ = ()
 
     def __new__(cls, x, y):
-        return super(Vector, cls).__new__(cls, tuple((x, y)))
+        return tuple.__new__(cls, (x, y))
+
+    x = property(itemgetter(0))
+    y = property(itemgetter(1))
 
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.length = (x * x + y * y) ** 0.5
+    @property
+    def length(self):
+        return (self[0] * self[0] + self[1] * self[1]) ** 0.5
 
     def scale_to(self, new_length):
         scale = new_length / self.length
-        return Vector(self.x * scale, self.y * scale)
+        return Vector(self[0] * scale, self[1] * scale)
 
     def normalize(self):
         return self.scale_to(1)
 
     def perpendicular_clockwise(self):
-        return Vector(self.y, -self.x)
+        return Vector(self[1], -self[0])
 
     def perpendicular_counterclockwise(self):
-        return Vector(-self.y, self.x)
+        return Vector(-self[1], self[0])
 
     def rotate(self, angle):
         angle = math.radians(angle)
-        x = self.x * math.cos(angle) - self.y * math.sin(angle)
-        y = self.x * math.sin(angle) + self.y * math.cos(angle)
+        x = self[0] * math.cos(angle) - self[1] * math.sin(angle)
+        y = self[0] * math.sin(angle) + self[1] * math.cos(angle)
 
         return Vector(x, y)
 
@@ -53,42 +60,42 @@ class Vector(tuple):
 
     def __add__(self, other):
         if isinstance(other, Vector):
-            return Vector(self.x + other.x, self.y + other.y)
+            return Vector(self[0] + other[0], self[1] + other[1])
         if isinstance(other, Point):
             raise TypeError("Can't add points to vectors! Add vectors to points instead.")
         else:
-            return Vector(self.x + other, self.y + other)
+            return Vector(self[0] + other, self[1] + other)
 
     def __sub__(self, other):
         if isinstance(other, Vector):
-            return Vector(self.x - other.x, self.y - other.y)
+            return Vector(self[0] - other[0], self[1] - other[1])
         if isinstance(other, Point):
             raise TypeError("Can't subtract points from vectors! Subtract vectors to points instead.")
         else:
-            return Vector(self.x + other, self.y + other)
+            return Vector(self[0] - other, self[1] - other)
 
     def __neg__(self):
-        return Vector(- self.x, - self.y)
+        return Vector(- self[0], - self[1])
 
     def __mul__(self, other):
         if isinstance(other, Vector):
-            return self.x * other.x + self.y * other.y
+            return self[0] * other[0] + self[1] * other[1]
         if isinstance(other, Point):
             raise TypeError("Can't multiply vectors and points!")
         else:
-            return Vector(self.x * other, self.y * other)
+            return Vector(self[0] * other, self[1] * other)
 
     def __rmul__(self, other):
         if isinstance(other, Vector):
-            return other.x * self.x + other.y * self.y
+            return other[0] * self[0] + other[1] * self[1]
         if isinstance(other, Point):
             raise TypeError("Can't multiply points and vectors!")
         else:
-            return Vector(other * self.x, other * self.y)
+            return Vector(other * self[0], other * self[1])
 
     def __eq__(self, other):
         if isinstance(other, Vector):
-            return self.x == other.x and self.y == other.y
+            return self[0] == other[0] and self[1] == other[1]
         else:
             raise TypeError(f"Can't compare to objects of type {type(other)}!")
 
@@ -117,21 +124,22 @@ class Vector(tuple):
             raise TypeError(f"Can't compare to objects of type {type(other)}!")
 
     def __repr__(self):
-        return f"[{self.x} {self.y}]"
+        return f"[{self[0]} {self[1]}]"
 
 
 class Point(tuple):
+    # no instance dictionary, the coordinates live in the tuple itself
+    __slots__ = ()
 
     def __new__(cls, x, y):
-        return super(Point, cls).__new__(cls, tuple((x, y)))
+        return tuple.__new__(cls, (x, y))
 
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
+    x = property(itemgetter(0))
+    y = property(itemgetter(1))
 
     def __add__(self, other):
         if isinstance(other, Vector):
-            return Point(self.x + other.x, self.y + other.y)
+            return Point(self[0] + other[0], self[1] + other[1])
         if isinstance(other, Point):
             raise TypeError("Can't add points to points!")
         else:
@@ -139,14 +147,211 @@ class Point(tuple):
 
     def __sub__(self, other):
         if isinstance(other, Vector):
-            return Point(self.x - other.x, self.y - other.y)
+            return Point(self[0] - other[0], self[1] - other[1])
         if isinstance(other, Point):
-            return Vector(self.x - other.x, self.y - other.y)
+            return Vector(self[0] - other[0], self[1] - other[1])
         else:
             raise TypeError("Can only subtract vectors or points from points!")
 
     def __eq__(self, other):
         if isinstance(other, Point):
-            return self.x == other.x and self.y == other.y
+            return self[0] == other[0] and self[1] == other[1]
         else:
             raise TypeError(f"Can't compare to objects of type {type(other)}!")
+
+
+class VectorArray:
+    """
+    Many vectors stored in one (n, 2) array. The operations of Vector are applied to all of them at once, with the same
+    floating point results as applying them to each Vector.
+    """
+
+    __slots__ = ("xy",)
+
+    def __init__(self, xy):
+        """
+        :param xy: Vectors as an array-like of shape (n, 2)
+        """
+
+        self.xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+
+    @classmethod
+    def from_angles(cls, angles, lengths=1):
+        """
+        Creates vectors pointing in the given directions, like Vector(1, 0).rotate(angle) * length.
+
+        :param angles: Angles (counterclockwise, relative to a horizontal vector pointing to the right)
+        :param lengths: Length of all vectors, or one length per vector
+        :returns: VectorArray
+        """
+
+        return cls(np.zeros((len(angles), 2)) + (1, 0)).rotate(angles) * lengths
+
+    @property
+    def x(self):
+        return self.xy[:, 0]
+
+    @property
+    def y(self):
+        return self.xy[:, 1]
+
+    @property
+    def length(self):
+        return (self.x * self.x + self.y * self.y) ** 0.5
+
+    def scale_to(self, new_length):
+        scale = np.asarray(new_length) / self.length
+        return VectorArray(self.xy * scale[:, None])
+
+    def normalize(self):
+        return self.scale_to(1)
+
+    def perpendicular_clockwise(self):
+        return VectorArray(np.column_stack((self.y, -self.x)))
+
+    def perpendicular_counterclockwise(self):
+        return VectorArray(np.column_stack((-self.y, self.x)))
+
+    def rotate(self, angle):
+        """
+        :param angle: Angle for all vectors, or one angle per vector
+        :returns: Rotated VectorArray
+        """
+
+        angle = np.radians(np.asarray(angle, dtype=float))
+        x = self.x * np.cos(angle) - self.y * np.sin(angle)
+        y = self.x * np.sin(angle) + self.y * np.cos(angle)
+
+        return VectorArray(np.column_stack((x, y)))
+
+    def __len__(self):
+        return len(self.xy)
+
+    def __getitem__(self, index):
+        return Vector(*self.xy[index].tolist())
+
+    def __iter__(self):
+        return (Vector(x, y) for x, y in self.xy.tolist())
+
+    def __add__(self, other):
+        if isinstance(other, (Vector, VectorArray)):
+            return VectorArray(self.xy + _coordinates(other))
+        if isinstance(other, (Point, PointArray)):
+            raise TypeError("Can't add points to vectors! Add vectors to points instead.")
+        else:
+            return VectorArray(self.xy + np.asarray(other)[..., None])
+
+    def __sub__(self, other):
+        if isinstance(other, (Vector, VectorArray)):
+            return VectorArray(self.xy - _coordinates(other))
+        if isinstance(other, (Point, PointArray)):
+            raise TypeError("Can't subtract points from vectors! Subtract vectors to points instead.")
+        else:
+            return VectorArray(self.xy - np.asarray(other)[..., None])
+
+    def __neg__(self):
+        return VectorArray(- self.xy)
+
+    def __mul__(self, other):
+        """
+        Multiplies by a scalar or one scalar per vector. The product with other vectors is the dot product.
+        """
+
+        if isinstance(other, (Vector, VectorArray)):
+            return (self.xy * _coordinates(other)).sum(axis=1)
+        if isinstance(other, (Point, PointArray)):
+            raise TypeError("Can't multiply vectors and points!")
+        else:
+            return VectorArray(self.xy * np.asarray(other)[..., None])
+
+    def __rmul__(self, other):
+        if isinstance(other, (Vector, VectorArray)):
+            return (_coordinates(other) * self.xy).sum(axis=1)
+        if isinstance(other, (Point, PointArray)):
+            raise TypeError("Can't multiply points and vectors!")
+        else:
+            return VectorArray(np.asarray(other)[..., None] * self.xy)
+
+    def __repr__(self):
+        return f"VectorArray({self.xy.tolist()})"
+
+
+class PointArray:
+    """
+    Many points stored in one (n, 2) array, see VectorArray.
+    """
+
+    __slots__ = ("xy",)
+
+    def __init__(self, xy):
+        """
+        :param xy: Points as an array-like of shape (n, 2)
+        """
+
+        self.xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+
+    @classmethod
+    def cell_centers(cls, width, height, rows, cols, cells=None):
+        """
+        Calculates the centers of the cells of a grid, computed like (col * col_step) + (col_step / 2).
+
+        :param width: Width of the grid in pixels
+        :param height: Height of the grid in pixels
+        :param rows: Number of rows
+        :param cols: Number of columns
+        :param cells: Array of (row, col) pairs, by default all cells in row-major order
+        :returns: PointArray
+        """
+
+        # how many pixels high/wide the rows/columns are
+        col_step = width / cols
+        row_step = height / rows
+
+        if cells is None:
+            cells = np.argwhere(np.ones((rows, cols)))
+        cells = np.asarray(cells).reshape(-1, 2)
+
+        return cls(np.column_stack(((cells[:, 1] * col_step) + (col_step / 2), (cells[:, 0] * row_step) + (row_step / 2))))
+
+    @property
+    def x(self):
+        return self.xy[:, 0]
+
+    @property
+    def y(self):
+        return self.xy[:, 1]
+
+    def __len__(self):
+        return len(self.xy)
+
+    def __getitem__(self, index):
+        return Point(*self.xy[index].tolist())
+
+    def __iter__(self):
+        return (Point(x, y) for x, y in self.xy.tolist())
+
+    def __add__(self, other):
+        if isinstance(other, (Vector, VectorArray)):
+            return PointArray(self.xy + _coordinates(other))
+        if isinstance(other, (Point, PointArray)):
+            raise TypeError("Can't add points to points!")
+        else:
+            raise TypeError("Can only add vectors to points!")
+
+    def __sub__(self, other):
+        if isinstance(other, (Vector, VectorArray)):
+            return PointArray(self.xy - _coordinates(other))
+        if isinstance(other, (Point, PointArray)):
+            return VectorArray(self.xy - _coordinates(other))
+        else:
+            raise TypeError("Can only subtract vectors or points from points!")
+
+    def __repr__(self):
+        return f"PointArray({self.xy.tolist()})"
+
+
+def _coordinates(other):
+    # (n, 2) array of an array type, or a single (x, y) row that is broadcast to all elements
+    if isinstance(other, (VectorArray, PointArray)):
+        return other.xy
+    return np.asarray(other, dtype=float)
@@ -0,0 +1,88 @@
+import math
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+from rotation import rotation
+
+DEFAULT_FONT = "fonts/ARIAL.TTF"
+
+
+@lru_cache(maxsize=32)
+def load_font(font=DEFAULT_FONT, size=10):
+    """
+    Loads a TrueType font. Each font is only read from disk once per size.
+
+    :param font: Path of the font file
+    :param size: Font size in pixels
+    :returns: FreeTypeFont
+    """
+
+    return ImageFont.truetype(font, size)
+
+
+@lru_cache(maxsize=64)
+def letter_layer(letter, font, color, mirror, size, location):
+    """
+    Renders a letter centered at location and mirrored at the vertical center line of an image of the given size,
+    before it is rotated. Only the bounding box of the letter is rendered, clipped to the image. The layer is shared by
+    all angles of the letter, so it is cached and must not be modified.
+
+    :param letter: Letter to render
+    :param font: FreeTypeFont to render the letter with
+    :param color: Color of the letter
+    :param mirror: Whether the letter is mirrored
+    :param size: Size (width, height) of the image the letter is placed on
+    :param location: Position (x, y) of the letter's center before mirroring
+    :returns: RGBA layer and its position (left, top) within the image, or None if the letter is outside the image
+    """
+
+    width, height = size
+
+    measure = ImageDraw.Draw(Image.new(mode="RGBA", size=(1, 1)))
+    left, top, right, bottom = measure.textbbox(location, letter, font=font, anchor="mm")
+    left, top = math.floor(left) - 1, math.floor(top) - 1
+    right, bottom = math.ceil(right) + 1, math.ceil(bottom) + 1
+
+    layer = Image.new(mode="RGBA", size=(right - left, bottom - top), color=(255, 255, 255, 0))
+    layer_draw = ImageDraw.Draw(layer)
+    layer_draw.text((location[0] - left, location[1] - top), letter, fill=color, font=font, anchor="mm")
+
+    # clip the layer to the image, like drawing onto a full-sized image would
+    clip_left, clip_top = max(left, 0), max(top, 0)
+    clip_right, clip_bottom = min(right, width), min(bottom, height)
+    if clip_right <= clip_left or clip_bottom <= clip_top:
+        return None
+    layer = layer.crop((clip_left - left, clip_top - top, clip_right - left, clip_bottom - top))
+
+    if mirror:
+        layer = ImageOps.mirror(layer)
+        clip_left = width - clip_right
+
+    return layer, (clip_left, clip_top)
+
+
+@lru_cache(maxsize=256)
+def glyph_layer(letter, font, color, mirror, angle, size, location):
+    """
+    Renders a letter the way Canvas.draw_letter places it on an image of the given size: centered at location, then
+    mirrored at the image's vertical center line and rotated about the image's center. The unrotated letter is rendered
+    once for all angles, and only its bounding box is rotated (see rotation.Rotation). Layers are cached, the returned
+    image must therefore not be modified.
+
+    :param letter: Letter to render
+    :param font: FreeTypeFont to render the letter with
+    :param color: Color of the letter
+    :param mirror: Whether the letter is mirrored
+    :param angle: Angle of the rotation (counterclockwise, in degrees)
+    :param size: Size (width, height) of the image the letter is placed on
+    :param location: Position (x, y) of the letter's center before mirroring and rotating
+    :returns: RGBA layer and its position (left, top) within the image, or None if the letter is outside the image
+    """
+
+    layer = letter_layer(letter, font, color, mirror, size, location)
+    if layer is None:
+        return None
+
+    return rotation(angle, size)(*layer)
+
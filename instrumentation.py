@@ -0,0 +1,303 @@
+import csv
+import functools
+import inspect
+import json
+import threading
+import time
+
+from canvas import Canvas
+from sinks import ArchiveSink, DirectorySink, Sink, resolve
+
+STAGE_PREFIXES = ("create_", "configure_", "generate_", "draw_")
+
+# marks the end of a generator stage
+_END = object()
+
+# (paradigm, stage) -> [calls, wall time, self time, bytes]
+_stages = {}
+# (paradigm, counter) -> count
+_counters = {}
+# (owner, attribute name) -> original attribute, while instrumentation is enabled
+_originals = {}
+
+_lock = threading.Lock()
+# stack of [paradigm, time spent in nested stages] of the stages running on each thread
+_local = threading.local()
+
+
+def _hooks():
+    # imported here, patterns.py imports this module to count retries
+    from arrow_span import ArrowSpan
+    from atlas import Atlas
+    from dot_span import DotSpan
+    from rotation_span import RotationSpan
+    from scene import Scene
+    from symmetry_span import SymmetrySpan
+
+    # (owner, attribute name, whether the paradigm is taken from the first argument)
+    hooks = [(Canvas, name, True) for name in vars(Canvas) if name.startswith("draw_")]
+    hooks += [(Canvas, "save", True), (Sink, "encode", False)]
+    hooks += [(sink, name, False) for sink in (DirectorySink, ArchiveSink) for name in ("write", "link")]
+    hooks += [(Scene, "render", True), (Scene, "save", True), (Atlas, "__init__", False)]
+
+    for paradigm in (ArrowSpan, RotationSpan, DotSpan, SymmetrySpan):
+        hooks += [(paradigm, name, True) for name in vars(paradigm) if name.startswith(STAGE_PREFIXES)]
+
+    return hooks
+
+
+def _paradigm_of(owner, args, from_argument):
+    if from_argument and args:
+        first = args[0]
+        if isinstance(first, type) and issubclass(first, Canvas):
+            return first.__name__
+        if isinstance(first, Canvas):
+            return type(first).__name__
+        # scenes count towards the paradigm they are drawn with
+        if isinstance(getattr(first, "cls", None), type) and issubclass(first.cls, Canvas):
+            return first.cls.__name__
+
+    if issubclass(owner, Canvas) and owner is not Canvas:
+        return owner.__name__
+
+    # helpers like sinks count towards the paradigm that called them
+    stack = getattr(_local, "stack", None)
+    if stack:
+        return stack[-1][0]
+    return ""
+
+
+def _run(paradigm, function, *args, **kwargs):
+    # calls a function as a stage of the paradigm, returns the result, the wall time and the self time
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+
+    frame = [paradigm, 0.0]
+    stack.append(frame)
+
+    start = time.perf_counter()
+    try:
+        result = function(*args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        if stack:
+            stack[-1][1] += elapsed
+
+    return result, elapsed, elapsed - frame[1]
+
+
+def _record(paradigm, stage, calls, elapsed, self_time, size):
+    with _lock:
+        entry = _stages.setdefault((paradigm, stage), [0, 0.0, 0.0, 0])
+        entry[0] += calls
+        entry[1] += elapsed
+        entry[2] += self_time
+        entry[3] += size
+
+
+def _iterate(generator, paradigm, stage):
+    # generators like create_scenes do their work while they are iterated, each step is timed as part of the stage
+    calls = 1
+    try:
+        while True:
+            item, elapsed, self_time = _run(paradigm, next, generator, _END)
+            _record(paradigm, stage, calls, elapsed, self_time, 0)
+            calls = 0
+            if item is _END:
+                return
+            yield item
+    finally:
+        generator.close()
+
+
+def _wrap(owner, name, function, from_argument):
+    stage = f"{owner.__name__}.{name}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        paradigm = _paradigm_of(owner, args, from_argument)
+        result, elapsed, self_time = _run(paradigm, function, *args, **kwargs)
+
+        if inspect.isgenerator(result):
+            # creating the generator takes no time, the stage is recorded while it runs
+            return _iterate(result, paradigm, stage)
+
+        if name == "encode":
+            size = len(result)
+        elif name == "write":
+            size = len(resolve(args[-1]))
+        else:
+            size = 0
+
+        # links write no image data, they are counted instead of their bytes
+        if name == "link":
+            with _lock:
+                _counters[(paradigm, "links")] = _counters.get((paradigm, "links"), 0) + 1
+
+        _record(paradigm, stage, 1, elapsed, self_time, size)
+
+        return result
+
+    return wrapper
+
+
+def enable():
+    """
+    Starts recording wall time, calls and bytes written of the drawing, saving and create_* methods of all paradigms,
+    and of rendering scenes and atlases, by wrapping these methods. Methods returning generators, like create_scenes,
+    are timed while the generator is iterated. Links to files written before add no bytes, they are counted as links.
+    Without calling this function nothing is wrapped, so there is no overhead.
+
+    :returns: None
+    """
+
+    if _originals:
+        return
+
+    for owner, name, from_argument in _hooks():
+        attribute = vars(owner)[name]
+        _originals[(owner, name)] = attribute
+
+        if isinstance(attribute, staticmethod):
+            wrapped = staticmethod(_wrap(owner, name, attribute.__func__, False))
+        elif isinstance(attribute, classmethod):
+            wrapped = classmethod(_wrap(owner, name, attribute.__func__, from_argument))
+        else:
+            wrapped = _wrap(owner, name, attribute, from_argument)
+
+        setattr(owner, name, wrapped)
+
+
+def disable():
+    """
+    Restores the original methods. The recorded numbers are kept until reset is called.
+
+    :returns: None
+    """
+
+    for (owner, name), attribute in _originals.items():
+        setattr(owner, name, attribute)
+    _originals.clear()
+
+
+def enabled():
+    return bool(_originals)
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def count(counter, n=1):
+    """
+    Increases a counter of the paradigm currently running, e.g. the number of retries of rejection sampling. Does
+    nothing if instrumentation is disabled.
+
+    :param counter: Name of the counter
+    :param n: Amount to add
+    :returns: None
+    """
+
+    if not _originals or not n:
+        return
+
+    stack = getattr(_local, "stack", None)
+    paradigm = stack[-1][0] if stack else ""
+
+    with _lock:
+        _counters[(paradigm, counter)] = _counters.get((paradigm, counter), 0) + n
+
+
+def snapshot():
+    """
+    Copies the numbers recorded so far, e.g. to hand them from a worker process to the main process.
+
+    :returns: Pair of stage and counter dicts, see merge
+    """
+
+    with _lock:
+        return {key: list(entry) for key, entry in _stages.items()}, dict(_counters)
+
+
+def merge(recorded):
+    """
+    Adds numbers recorded elsewhere to the numbers of this process.
+
+    :param recorded: Pair of stage and counter dicts returned by snapshot
+    :returns: None
+    """
+
+    stages, counters = recorded
+    with _lock:
+        for key, other in stages.items():
+            entry = _stages.setdefault(key, [0, 0.0, 0.0, 0])
+            for i, value in enumerate(other):
+                entry[i] += value
+        for key, value in counters.items():
+            _counters[key] = _counters.get(key, 0) + value
+
+
+def profiled(function, *args, **kwargs):
+    """
+    Calls a function with instrumentation enabled and returns what it recorded. Used to run jobs in worker processes,
+    which don't share the numbers of the main process.
+
+    :param function: Function to call
+    :param args: Positional arguments of the function
+    :param kwargs: Keyword arguments of the function
+    :returns: Pair of the function's result and the recorded numbers (see snapshot)
+    """
+
+    enable()
+    reset()
+    result = function(*args, **kwargs)
+
+    return result, snapshot()
+
+
+def report():
+    """
+    Summarizes the recorded numbers. The time of a stage includes the stages it calls, its self time doesn't. Work of
+    background writer threads is listed without paradigm.
+
+    :returns: Dict with a list of stages and a list of counters, sorted by paradigm and name
+    """
+
+    stages, counters = snapshot()
+
+    return {
+        "stages": [{"paradigm": paradigm, "stage": stage, "calls": calls, "time": wall_time, "self_time": self_time,
+                    "bytes": size}
+                   for (paradigm, stage), (calls, wall_time, self_time, size) in sorted(stages.items())],
+        "counters": [{"paradigm": paradigm, "counter": counter, "count": value}
+                     for (paradigm, counter), value in sorted(counters.items())]
+    }
+
+
+def write_report(path):
+    """
+    Writes the report to a file, as CSV if the path ends with .csv and as JSON otherwise. In the CSV file, counters are
+    rows whose stage is the counter's name and whose calls are the count.
+
+    :param path: Path of the report
+    :returns: None
+    """
+
+    summary = report()
+
+    if not path.endswith(".csv"):
+        with open(path, "w") as file:
+            json.dump(summary, file, indent=2)
+        return
+
+    fields = ("paradigm", "stage", "calls", "time", "self_time", "bytes")
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(summary["stages"])
+        for counter in summary["counters"]:
+            writer.writerow({"paradigm": counter["paradigm"], "stage": counter["counter"], "calls": counter["count"]})
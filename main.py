@@ -1,10 +1,116 @@
-from symmetry_span import SymmetrySpan
-from arrow_span import ArrowSpan
-from rotation_span import RotationSpan
-from dot_span import DotSpan
+import argparse
+import inspect
+import os
+
+import numpy as np
+
+import instrumentation
+from batch import BATTERY, batch_length, create_jobs, run_batches
+from export import export_batch
+from manifest import Manifest
+from sinks import ArchiveSink, ThreadedSink
 
 if __name__ == "__main__":
-    RotationSpan.create_batch()
-    ArrowSpan.create_batch()
-    DotSpan.create_batch()
-    SymmetrySpan.create_batch()
+    parser = argparse.ArgumentParser(description="Creates the stimuli of all paradigms of the battery.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="root seed, the same seed always produces the same stimuli (default: random)")
+    parser.add_argument("--archive", default=None,
+                        help="write all stimuli into this .zip or .tar archive instead of separate files")
+    parser.add_argument("--background-writer", action="store_true",
+                        help="encode and write files on a background thread while the next stimuli are rendered")
+    parser.add_argument("--format", default="png", choices=("png", "webp"),
+                        help="image format, WebP images are lossless (default: png)")
+    parser.add_argument("--depth", default="auto",
+                        help="color depth of PNG files: auto (smallest lossless), 1, L, P, RGB or RGBA (default: auto)")
+    parser.add_argument("--compress-level", type=int, default=None,
+                        help="zlib level of PNG files (0-9) or effort of WebP compression (0-6)")
+    parser.add_argument("--optimize", action="store_true",
+                        help="search for the smallest encoding of each file, which takes longer")
+    parser.add_argument("--sizes", type=int, nargs="+", default=None,
+                        help="render every stimulus at these widths and heights, each size into its own folder such as "
+                             "600x600/ (default: the size of each paradigm)")
+    parser.add_argument("--supersample", type=int, default=1,
+                        help="draw at this multiple of the size and reduce afterwards, for anti-aliasing (default: 1)")
+    parser.add_argument("--shard", type=int, default=0,
+                        help="index of the shard of the battery this run creates, from 0 to --shards - 1 (default: 0)")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="split the battery into this many shards, e.g. for separate machines. All shards need the "
+                             "same --seed, together they create the same files as a single run (default: 1)")
+    parser.add_argument("--manifest", default=None,
+                        help="record the inputs and files of each stimulus in this file, and only create the stimuli "
+                             "whose inputs or files changed since the last run. With --seed, manifest.json (or "
+                             "manifest.shard<shard>of<shards>.json with --shards) is used by default. Without a seed "
+                             "every run creates new stimuli, so no manifest is used. Not used with --archive")
+    parser.add_argument("--force", action="store_true",
+                        help="create all stimuli, even if they are unchanged according to the manifest")
+    parser.add_argument("--atlas", action="store_true",
+                        help="save the arrow and letter pools as one atlas image each, and every set as a JSON index "
+                             "of its regions instead of an image per member")
+    parser.add_argument("--distinct", action="store_true",
+                        help="draw distinct symmetry patterns within each batch, uniformly among all symmetric and "
+                             "asymmetric grids, instead of adding noise to the right half of asymmetric ones")
+    parser.add_argument("--export", default=None,
+                        help="instead of image files, draw each paradigm into a memory-mapped .npy tensor with a .csv "
+                             "table of its stimuli in this folder, see export.export_batch")
+    parser.add_argument("--profile", default=None,
+                        help="record the time, calls and bytes written of each stage and write them to this JSON or "
+                             ".csv report")
+    args = parser.parse_args()
+
+    if args.shards > 1 and args.seed is None:
+        parser.error("--shards needs a --seed shared by all shards")
+    if not 0 <= args.shard < args.shards:
+        parser.error(f"--shard must be between 0 and {args.shards - 1}")
+
+    save_options = {"extension": args.format, "depth": args.depth, "compress_level": args.compress_level,
+                    "optimize": args.optimize}
+    image_sizes = [(size, size) for size in args.sizes] if args.sizes else None
+    # flags of the paradigms whose create_batch takes them
+    flags = [flag for flag in ("atlas", "distinct") if getattr(args, flag)]
+    battery = tuple((cls, dict(kwargs, **{flag: True for flag in flags
+                                          if flag in inspect.signature(cls.create_batch).parameters}))
+                    for cls, kwargs in BATTERY)
+    batches = tuple((cls, dict(kwargs, save_options=save_options, image_sizes=image_sizes, supersample=args.supersample))
+                    for cls, kwargs in battery)
+
+    seed = args.seed
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+        print(f"Using seed {seed}")
+
+    if args.profile:
+        instrumentation.enable()
+
+    if args.export:
+        os.makedirs(args.export, exist_ok=True)
+        shard = f".shard{args.shard}of{args.shards}" if args.shards > 1 else ""
+        # one job per paradigm, holding the stimuli of this shard
+        chunk_size = max(batch_length(cls, **kwargs) for cls, kwargs in battery)
+        for cls, kwargs in create_jobs(battery, seed=seed, chunk_size=chunk_size, shard=args.shard, shards=args.shards):
+            for size in image_sizes or (None,):
+                name = f"{cls.__name__}_{size[0]}x{size[1]}" if size else cls.__name__
+                export_batch(cls, os.path.join(args.export, f"{name}{shard}.npy"), size=size,
+                             supersample=args.supersample, **kwargs)
+    elif args.archive:
+        sink = ArchiveSink(args.archive)
+        if args.background_writer:
+            sink = ThreadedSink(sink)
+        with sink:
+            run_batches(batches, workers=args.workers, seed=seed, sink=sink, threaded=args.background_writer,
+                        shard=args.shard, shards=args.shards)
+    else:
+        manifest_path = args.manifest
+        if manifest_path is None and args.seed is not None:
+            manifest_path = f"manifest.shard{args.shard}of{args.shards}.json" if args.shards > 1 else "manifest.json"
+        manifest = Manifest(manifest_path) if manifest_path else None
+        if manifest is not None and args.force:
+            manifest.stimuli = {}
+        run_batches(batches, workers=args.workers, seed=seed, threaded=args.background_writer, manifest=manifest,
+                    shard=args.shard, shards=args.shards)
+        if manifest is not None and manifest.skipped:
+            print(f"Skipped {manifest.skipped} unchanged stimuli")
+
+    if args.profile:
+        instrumentation.write_report(args.profile)
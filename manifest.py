@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import sys
+
+from sinks import RecordingSink
+
+# create_batch arguments that don't change the stimulus with a given index. A pattern index (see patterns.PatternIndex)
+# changes the patterns, so it is part of the inputs, described by its grid size and file since its content grows with
+# every stimulus drawn.
+IGNORED_ARGUMENTS = ("seed", "indices", "sink", "batch_size", "arrows", "letters", "budget")
+
+
+def source_digest():
+    """
+    Digest of the code and fonts the stimuli are drawn with: the loaded modules of this folder and the font files.
+
+    :returns: Hexadecimal digest
+    """
+
+    folder = os.path.dirname(os.path.abspath(__file__))
+    paths = set()
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.dirname(os.path.abspath(path)) == folder:
+            paths.add(os.path.abspath(path))
+
+    fonts = os.path.join(folder, "fonts")
+    if os.path.isdir(fonts):
+        paths.update(os.path.join(fonts, name) for name in os.listdir(fonts))
+
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(paths):
+        digest.update(os.path.relpath(path, folder).encode())
+        with open(path, "rb") as file:
+            digest.update(hashlib.blake2b(file.read(), digest_size=16).digest())
+
+    return digest.hexdigest()
+
+
+def file_digest(path):
+    # digest of a file's content like RecordingSink records it, None if the file doesn't exist
+    try:
+        with open(path, "rb") as file:
+            return RecordingSink.digest(file.read())
+    except FileNotFoundError:
+        return None
+
+
+class Manifest:
+    """
+    Record of the files each stimulus (or set) of a battery was saved to, like a build system's. For every stimulus it
+    keeps a digest of its inputs (paradigm, create_batch arguments, root seed and index) and a digest of each file.
+    A stimulus is only created again if its inputs, a file or the code changed (see batch.run_batches).
+    """
+
+    def __init__(self, path="manifest.json", root=""):
+        """
+        :param path: File the manifest is loaded from, if it exists, and saved to
+        :param root: Folder (with trailing separator) the filenames are relative to, like DirectorySink's root
+        """
+
+        self.path = path
+        self.root = root
+        self.source = source_digest()
+        # "paradigm/index" -> {"inputs": digest, "files": {filename: digest}}
+        self.stimuli = {}
+        self.skipped = 0
+
+        if os.path.exists(path):
+            with open(path) as file:
+                data = json.load(file)
+            # changed code or fonts may change every stimulus
+            if data.get("source") == self.source:
+                self.stimuli = data["stimuli"]
+
+    @staticmethod
+    def key(cls, index):
+        return f"{cls.__name__}/{index}"
+
+    @staticmethod
+    def inputs(cls, kwargs, seed, index):
+        """
+        Digest of everything a stimulus is created from.
+
+        :param cls: Paradigm class
+        :param kwargs: Arguments of create_batch
+        :param seed: Root seed
+        :param index: Index of the stimulus within the batch
+        :returns: Hexadecimal digest
+        """
+
+        arguments = {key: value for key, value in kwargs.items() if key not in IGNORED_ARGUMENTS}
+        text = json.dumps([cls.__name__, arguments, seed, index], sort_keys=True, default=repr)
+
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def fresh(self, cls, kwargs, seed, index):
+        """
+        Whether a stimulus was created from the same inputs before and all its files are unchanged.
+
+        :returns: Boolean
+        """
+
+        stimulus = self.stimuli.get(self.key(cls, index))
+        if stimulus is None or stimulus["inputs"] != self.inputs(cls, kwargs, seed, index):
+            return False
+
+        return all(file_digest(f"{self.root}{filename}") == digest for filename, digest in stimulus["files"].items())
+
+    def stale(self, cls, kwargs, seed, indices):
+        """
+        Filters the stimuli that have to be created.
+
+        :param cls: Paradigm class
+        :param kwargs: Arguments of create_batch
+        :param seed: Root seed
+        :param indices: Indices of the stimuli
+        :returns: List of the indices of stimuli that are not fresh
+        """
+
+        stale = [index for index in indices if not self.fresh(cls, kwargs, seed, index)]
+        self.skipped += len(indices) - len(stale)
+
+        return stale
+
+    def record(self, cls, kwargs, seed, files):
+        """
+        Records the files of created stimuli.
+
+        :param cls: Paradigm class
+        :param kwargs: Arguments of create_batch
+        :param seed: Root seed
+        :param files: Dict mapping the index of each stimulus to a dict of its filenames and their digests, as recorded
+                      by a RecordingSink
+        :returns: None
+        """
+
+        for index, stimulus_files in files.items():
+            self.stimuli[self.key(cls, index)] = {"inputs": self.inputs(cls, kwargs, seed, index),
+                                                  "files": stimulus_files}
+
+    def save(self, path=None):
+        if path is None:
+            path = self.path
+
+        with open(path, "w") as file:
+            json.dump({"source": self.source, "stimuli": self.stimuli}, file, indent=1, sort_keys=True)
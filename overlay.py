@@ -0,0 +1,162 @@
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from geometry import Vector, Point
+
+# 4x4 Bayer matrix, used as threshold map for ordered dithering
+BAYER = np.array([[0, 8, 2, 10],
+                  [12, 4, 14, 6],
+                  [3, 11, 1, 9],
+                  [15, 7, 13, 5]]) / 16
+
+
+def checker_tile(cell=1):
+    """
+    Creates one period of a checkerboard. Pixels with an even sum of coordinates are set.
+
+    :param cell: Side length of the checkerboard's cells in pixels
+    :returns: Boolean array with shape (2 * cell, 2 * cell)
+    """
+
+    index = np.arange(2 * cell) // cell
+    return (index[:, None] + index[None, :]) % 2 == 0
+
+
+def stripe_tile(period=2, width=1, vertical=False):
+    """
+    Creates one period of a stripe pattern.
+
+    :param period: Distance between the starts of two stripes in pixels
+    :param width: Width of each stripe in pixels
+    :param vertical: Whether the stripes run from top to bottom instead of from left to right
+    :returns: Boolean array with shape (period, 1) or (1, period)
+    """
+
+    stripe = np.arange(period) < width
+    if vertical:
+        return stripe[None, :]
+    return stripe[:, None]
+
+
+def dither_tile(density=0.5):
+    """
+    Creates one period of an ordered dither pattern.
+
+    :param density: Fraction of pixels that are set
+    :returns: Boolean array with shape (4, 4)
+    """
+
+    return BAYER < density
+
+
+TILES = {"checker": checker_tile, "stripes": stripe_tile, "dither": dither_tile}
+
+
+def pattern_mask(pattern, size, offset=(0, 0), **params):
+    """
+    Repeats one period of a pattern over an area.
+
+    :param pattern: Name of the pattern (see TILES)
+    :param size: Size (width, height) of the area
+    :param offset: Position of the area's top left corner in the full image, keeps the pattern aligned across areas
+    :param params: Parameters passed on to the pattern's tile function
+    :returns: Boolean array with shape (height, width)
+    """
+
+    if pattern not in TILES:
+        raise ValueError(f"Unknown pattern {pattern}! Choose one of {', '.join(TILES)}.")
+
+    tile = TILES[pattern](**params)
+    rows = (np.arange(size[1]) + offset[1]) % tile.shape[0]
+    cols = (np.arange(size[0]) + offset[0]) % tile.shape[1]
+
+    return tile[np.ix_(rows, cols)]
+
+
+@lru_cache(maxsize=32)
+def _overlay_layer(pattern, params, size, phase, color):
+    layer = np.empty((size[1], size[0], 4), dtype=np.uint8)
+    layer[...] = (255, 255, 255, 0)
+    layer[pattern_mask(pattern, size, offset=phase, **dict(params))] = color
+
+    return Image.fromarray(layer, mode="RGBA")
+
+
+def overlay_layer(pattern, size, color, offset=(0, 0), **params):
+    """
+    Returns a transparent RGBA layer with the pattern's pixels set to the given color. Layers are cached per pattern,
+    size and color, the returned image must therefore not be modified.
+
+    :param pattern: Name of the pattern (see TILES)
+    :param size: Size (width, height) of the layer
+    :param color: Color of the pattern's pixels
+    :param offset: Position of the layer in the full image
+    :param params: Parameters passed on to the pattern's tile function
+    :returns: RGBA image
+    """
+
+    if pattern not in TILES:
+        raise ValueError(f"Unknown pattern {pattern}! Choose one of {', '.join(TILES)}.")
+
+    # only the position within one period of the pattern matters for the layer's content
+    tile_height, tile_width = TILES[pattern](**params).shape
+    phase = (offset[0] % tile_width, offset[1] % tile_height)
+
+    return _overlay_layer(pattern, tuple(sorted(params.items())), tuple(size), phase, tuple(color))
+
+
+@lru_cache(maxsize=16)
+def grid_layer(size, rows, cols, line_thickness):
+    """
+    Renders the lines of a grid, matching the lines Canvas.draw_grid draws. Layers are cached per size, number of rows
+    and columns and line thickness.
+
+    Grid lines cover whole rows and columns of pixels, so the layer is stored as the rectangles the lines cover, which
+    can be filled much faster than a mask can be pasted. The mask is kept in case the lines can't be split up like this.
+
+    :param size: Size (width, height) of the image
+    :param rows: Number of rows
+    :param cols: Number of columns
+    :param line_thickness: Thickness of the lines in pixels
+    :returns: Tuple of boxes (left, top, right, bottom) covering the lines, or None, and the mask of the lines ("1"
+              image, must not be modified)
+    """
+
+    width, height = size
+    mask = Image.new(mode="1", size=size, color=0)
+    mask_draw = ImageDraw.Draw(mask)
+
+    line_offset = Vector(line_thickness // 2, line_thickness // 2)
+
+    # how many pixels high/wide the rows/columns are
+    col_step = width / cols
+    row_step = height / rows
+
+    for row in range(rows + 1):
+        y = row * row_step
+        start = Point(0, y) - line_offset
+        end = Point(width + line_thickness, y) - line_offset
+        mask_draw.line([start, end], fill=1, width=line_thickness)
+
+    for col in range(cols + 1):
+        x = col * col_step
+        start = Point(x, 0) - line_offset
+        end = Point(x, height + line_thickness) - line_offset
+        mask_draw.line([start, end], fill=1, width=line_thickness)
+
+    pixels = np.asarray(mask)
+    full_rows = pixels.all(axis=1)
+    full_cols = pixels.all(axis=0)
+    if not np.array_equal(pixels, full_rows[:, None] | full_cols[None, :]):
+        return None, mask
+
+    return tuple(_runs(full_rows, lambda start, end: (0, start, width, end)) +
+                 _runs(full_cols, lambda start, end: (start, 0, end, height))), mask
+
+
+def _runs(flags, to_box):
+    # boxes for all runs of consecutive True values
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], flags.astype(np.int8), [0]))))
+    return [to_box(int(start), int(end)) for start, end in zip(edges[::2], edges[1::2])]
@@ -0,0 +1,242 @@
+import os
+
+import numpy as np
+
+from instrumentation import count
+
+
+def pack(grids):
+    """
+    Encodes grids of zeros and ones as integers, bit i being the i-th cell in row-major order. An 8x8 grid fits in 64
+    bits.
+
+    :param grids: Array of shape (rows, cols) or (n, rows, cols)
+    :returns: List of integers, one per grid
+    """
+
+    grids = np.asarray(grids)
+    bits = grids.reshape(-1, grids.shape[-2] * grids.shape[-1]) != 0
+    packed = np.packbits(bits, axis=1, bitorder="little")
+
+    return [int.from_bytes(row.tobytes(), "little") for row in packed]
+
+
+def unpack(keys, rows, cols):
+    """
+    Decodes integers created by pack.
+
+    :param keys: List of integers
+    :param rows: Number of rows of the grids
+    :param cols: Number of columns of the grids
+    :returns: Array of zeros and ones with shape (len(keys), rows, cols)
+    """
+
+    return _bits(keys, rows * cols).reshape(-1, rows, cols)
+
+
+def _bits(values, n_bits):
+    # (len(values), n_bits) array of the lowest bits of arbitrarily large integers, least significant bit first
+    n_bytes = (n_bits + 7) // 8
+    data = b"".join(int(value).to_bytes(n_bytes, "little") for value in values)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(-1, n_bytes), axis=1, bitorder="little")
+
+    return bits[:, :n_bits]
+
+
+def _random_below(n):
+    # uniform integer in [0, n) from the global NumPy random state, also for n beyond 64 bits
+    if n <= np.iinfo(np.int64).max:
+        return int(np.random.randint(0, n, dtype=np.int64))
+
+    # 64 more random bits than needed make the modulo bias negligible
+    chunks = (n.bit_length() + 64 + 61) // 62
+    value = 0
+    for chunk in np.random.randint(0, 2 ** 62, size=chunks, dtype=np.int64).tolist():
+        value = (value << 62) | chunk
+
+    return value % n
+
+
+def sample_ranks(total, n):
+    """
+    Draws distinct integers from [0, total) with Floyd's algorithm: exactly n random draws, no retries.
+
+    :param total: Size of the range
+    :param n: Number of integers
+    :returns: List of distinct integers in random order
+    """
+
+    if n > total:
+        raise ValueError(f"Can't draw {n} distinct ranks out of {total}!")
+
+    ranks = []
+    chosen = set()
+    for j in range(total - n, total):
+        rank = _random_below(j + 1)
+        if rank in chosen:
+            rank = j
+        chosen.add(rank)
+        ranks.append(rank)
+
+    # Floyd's algorithm favors small ranks early and large ranks late, and returns all ranks in order if n == total
+    np.random.shuffle(ranks)
+
+    return ranks
+
+
+def symmetric_count(rows, cols):
+    # the left half, including the center column of odd grids, determines a symmetric grid
+    return 2 ** (rows * ((cols + 1) // 2))
+
+
+def asymmetric_count(rows, cols):
+    # any right half except the mirrored left half
+    return symmetric_count(rows, cols) * (2 ** (rows * (cols // 2)) - 1)
+
+
+def unrank_symmetric(ranks, rows, cols):
+    """
+    Symmetric grids (see SymmetrySpan.generate_squares) with the given ranks. The rank is the packed left half.
+
+    :param ranks: List of integers in [0, symmetric_count(rows, cols))
+    :param rows: Number of rows
+    :param cols: Number of columns
+    :returns: Array of zeros and ones with shape (len(ranks), rows, cols)
+    """
+
+    left = unpack(ranks, rows, (cols + 1) // 2)
+    right = left[:, :, ::-1][:, :, cols % 2:]
+
+    return np.concatenate((left, right), axis=2)
+
+
+def unrank_asymmetric(ranks, rows, cols):
+    """
+    Asymmetric grids with the given ranks. The rank combines the packed left half and the index of the right half among
+    all right halves that don't mirror the left one.
+
+    :param ranks: List of integers in [0, asymmetric_count(rows, cols))
+    :param rows: Number of rows
+    :param cols: Number of columns
+    :returns: Array of zeros and ones with shape (len(ranks), rows, cols)
+    """
+
+    right_count = 2 ** (rows * (cols // 2)) - 1
+    lefts, rights = zip(*(divmod(rank, right_count) for rank in ranks))
+
+    symmetric = unrank_symmetric(lefts, rows, cols)
+    mirrored = pack(symmetric[:, :, (cols + 1) // 2:])
+
+    # skip the mirrored right half
+    rights = [right + (right >= mirror) for right, mirror in zip(rights, mirrored)]
+    right = unpack(rights, rows, cols // 2)
+
+    return np.concatenate((symmetric[:, :, :(cols + 1) // 2], right), axis=2)
+
+
+def sample_symmetry_patterns(n, rows=8, cols=8, symmetric=True):
+    """
+    Draws distinct symmetric or asymmetric grids, uniformly among all such grids.
+
+    :param n: Number of grids
+    :param rows: Number of rows
+    :param cols: Number of columns
+    :param symmetric: Whether the grids are symmetric
+    :returns: Array of zeros and ones with shape (n, rows, cols)
+    """
+
+    if symmetric:
+        return unrank_symmetric(sample_ranks(symmetric_count(rows, cols), n), rows, cols)
+    return unrank_asymmetric(sample_ranks(asymmetric_count(rows, cols), n), rows, cols)
+
+
+def draw_unique(generate, index=None, attempts=1000):
+    """
+    Calls a pattern generator until it returns a pattern that is not in the index yet, and adds it to the index. The
+    rejected patterns are counted as pattern_retries (see instrumentation.count).
+
+    :param generate: Function without arguments returning a grid
+    :param index: PatternIndex, without an index the first pattern is returned
+    :param attempts: Maximum number of calls
+    :returns: Grid
+    """
+
+    for attempt in range(attempts):
+        grid = generate()
+        if index is None or index.add(grid):
+            count("pattern_retries", attempt)
+            return grid
+
+    count("pattern_retries", attempts)
+    raise ValueError(f"No new pattern in {attempts} attempts, the index holds {len(index)} patterns!")
+
+
+class PatternIndex:
+    """
+    Set of packed grids of one size, to reject patterns that were generated before. The index can be stored in a text
+    file (the grid size, followed by one hexadecimal key per line), so patterns stay unique across runs. Worker
+    processes would get a copy of the index, so batch.run_batches only takes an index with a single worker.
+    """
+
+    def __init__(self, rows, cols, path=None):
+        """
+        :param rows: Number of rows of the grids
+        :param cols: Number of columns of the grids
+        :param path: File the index is loaded from, if it exists, and saved to
+        """
+
+        self.rows = rows
+        self.cols = cols
+        self.path = path
+        self.keys = set()
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def add(self, grid):
+        """
+        Adds a grid, unless it is in the index already.
+
+        :param grid: Array of shape (rows, cols)
+        :returns: Whether the grid was new
+        """
+
+        key = pack(grid)[0]
+        if key in self.keys:
+            return False
+
+        self.keys.add(key)
+        return True
+
+    def load(self, path):
+        with open(path) as file:
+            rows, cols = (int(value) for value in file.readline().split())
+            if (rows, cols) != (self.rows, self.cols):
+                raise ValueError(f"{path} holds {rows}x{cols} grids, not {self.rows}x{self.cols}!")
+
+            self.keys.update(int(line, 16) for line in file if line.strip())
+
+    def save(self, path=None):
+        if path is None:
+            path = self.path
+
+        with open(path, "w") as file:
+            file.write(f"{self.rows} {self.cols}\n")
+            file.writelines(f"{key:x}\n" for key in sorted(self.keys))
+
+    def __contains__(self, grid):
+        return pack(grid)[0] in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __repr__(self):
+        # the same index file gives the same description, however many patterns it holds, see manifest.Manifest.inputs
+        return f"PatternIndex({self.rows}, {self.cols}, {self.path!r})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.path:
+            self.save()
@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+from PIL import Image
+
+# bytes a pool keeps of rendered and encoded stimuli by default
+DEFAULT_BUDGET = 64 * 2 ** 20
+
+
+def nbytes(value):
+    """
+    Approximate memory used by a cached value: images, canvases, bytes, strings, arrays, encodings (see
+    sinks.Encoding) and tuples of them.
+
+    :param value: Cached value
+    :returns: Number of bytes
+    """
+
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, tuple):
+        return sum(nbytes(element) for element in value)
+    if hasattr(value, "nbytes"):
+        return value.nbytes
+    if hasattr(value, "image"):
+        return nbytes(value.image)
+    return 0
+
+
+def pending(value):
+    # whether a cached value is still being computed, e.g. encoded by a sinks.ThreadedSink, so its size may change
+    if isinstance(value, tuple):
+        return any(pending(element) for element in value)
+    return isinstance(value, Future) and not value.done()
+
+
+class ByteCache:
+    """
+    Mapping that evicts the least recently used entries once their total size exceeds a byte budget.
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        """
+        :param budget: Maximum total size of the entries in bytes
+        """
+
+        self.budget = budget
+        self.size = 0
+        self.entries = OrderedDict()
+        # keys of values that were still being computed when they were added, their size is counted as 0 so far
+        self.pending = set()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __getitem__(self, key):
+        value, size = self.entries[key]
+        self.entries.move_to_end(key)
+
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+            self.pending.discard(key)
+
+        # values still being computed are measured once the budget is exceeded, see measure
+        if pending(value):
+            size = 0
+            self.pending.add(key)
+        else:
+            size = nbytes(value)
+            if size > self.budget:
+                return
+
+        self.entries[key] = (value, size)
+        self.size += size
+
+        self.measure(wait=False)
+        if self.size > self.budget:
+            self.measure()
+        while self.size > self.budget:
+            self.size -= self.entries.popitem(last=False)[1][1]
+
+    def measure(self, wait=True):
+        """
+        Adds the sizes of the values that were still being computed when they were added.
+
+        :param wait: Whether to wait for values still being computed, otherwise only those that are ready are measured
+        :returns: None
+        """
+
+        for key in list(self.pending):
+            value, size = self.entries[key]
+            if not wait and pending(value):
+                continue
+
+            for element in value if isinstance(value, tuple) else (value,):
+                if isinstance(element, Future):
+                    element.exception()
+
+            self.entries[key] = (value, nbytes(value))
+            self.size += self.entries[key][1] - size
+            self.pending.discard(key)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class LazyPool:
+    """
+    Stimulus pool that only holds the parameters of its items, scenes, which are drawn when a set using them is saved.
+    The scenes keep their encoded files in the pool's ByteCache (see Scene.save), so a member picked by many sets is
+    drawn and encoded once, and the memory of a pool is bounded no matter how many members it has.
+    """
+
+    def __init__(self, items, budget=DEFAULT_BUDGET):
+        """
+        :param items: Scenes of the pool
+        :param budget: Bytes of encoded files kept in memory
+        """
+
+        self.items = list(items)
+        self.cache = ByteCache(budget)
+        # (size, supersample) -> atlas of the pool, see atlas.pool_atlas
+        self.atlases = {}
+
+        for item in self.items:
+            if hasattr(item, "files"):
+                item.files = self.cache
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[int(index)]
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def choice(self, size):
+        """
+        Draws items with replacement, using the global random state like np.random.choice on an array of the items.
+
+        :param size: Number of items
+        :returns: Array of indices
+        """
+
+        return np.random.choice(len(self), size)
@@ -0,0 +1,203 @@
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+from arrow_span import ArrowSpan
+from dot_span import DotSpan
+from geometry import Vector, Point
+from glyphs import DEFAULT_FONT
+from rotation_span import RotationSpan
+from symmetry_span import SymmetrySpan
+
+
+class ReferenceCanvas:
+    """
+    Straightforward implementation of the Canvas primitives, the way they were first written: every image is RGBA and
+    every primitive draws on (or composites) the full image. It is slow but obviously correct, and the optimized
+    primitives of Canvas must produce the same pixels (see verify.py).
+    """
+
+    def __init__(self, size=(1210, 1210), background_color=(255, 255, 255, 255), name="canvas"):
+        self.width = int(size[0])
+        self.height = int(size[1])
+        self.size = (self.width, self.height)
+        self.mode = "RGBA"
+        self.background_color = background_color
+        self.name = name
+
+        self.center = Point(self.width / 2, self.height / 2)
+
+        self.image = Image.new("RGBA", self.size, background_color)
+        self.draw = ImageDraw.Draw(self.image, mode="RGBA")
+
+    def draw_grid(self, rows=8, cols=8, color=(0, 0, 0, 255), line_thickness=None):
+        if not line_thickness:
+            line_thickness = max(1, max(self.width, self.height) // 400) * 2
+
+        line_offset = Vector(line_thickness // 2, line_thickness // 2)
+
+        # how many pixels high/wide the rows/columns are
+        col_step = self.width / cols
+        row_step = self.height / rows
+
+        for row in range(rows + 1):
+            y = row * row_step
+            start = Point(0, y) - line_offset
+            end = Point(self.width + line_thickness, y) - line_offset
+            self.draw.line([start, end], fill=color, width=line_thickness)
+
+        for col in range(cols + 1):
+            x = col * col_step
+            start = Point(x, 0) - line_offset
+            end = Point(x, self.height + line_thickness) - line_offset
+            self.draw.line([start, end], fill=color, width=line_thickness)
+
+    def draw_arrow(self, start, end, color=(0, 0, 0, 255), line_thickness=None, tip_width=None, tip_length=None):
+        if not line_thickness:
+            line_thickness = max(1, max(self.width, self.height) // 100) * 2
+        if not tip_width:
+            tip_width = 6 * line_thickness
+        if not tip_length:
+            tip_length = tip_width*0.6
+
+        start = Point(*start)
+        tip = Point(*end)
+        direction = (tip - start).normalize()
+        line_end = tip - tip_length * direction
+
+        left = direction.perpendicular_counterclockwise()
+        right = direction.perpendicular_clockwise()
+
+        left_corner = line_end + (tip_width / 2) * left
+        right_corner = line_end + (tip_width / 2) * right
+
+        self.draw.polygon([left_corner, tip, right_corner], fill=color, outline=None, width=0)
+        self.draw.line([start, line_end], fill=color, width=line_thickness)
+
+    def draw_radial_arrow(self, angle=0, length=None, color=(0, 0, 0, 255), line_thickness=None, tip_width=None,
+                          tip_length=None):
+        if not length:
+            length = min(self.width, self.height) / 4
+
+        direction = Vector(1, 0).rotate(angle)
+        end = self.center + length * direction
+
+        self.draw_arrow(start=self.center, end=end, color=color, line_thickness=line_thickness,
+                        tip_width=tip_width, tip_length=tip_length)
+
+    def draw_dot(self, center=None, radius=None, color=(0, 0, 0, 255)):
+        if not center:
+            center = self.center
+        else:
+            center = Point(*center)
+        if not radius:
+            radius = min(self.width, self.height) / 4
+
+        top_left = center + radius*Vector.up() + radius*Vector.left()
+        bottom_right = center + radius*Vector.down() + radius*Vector.right()
+
+        self.draw.ellipse([top_left, bottom_right], fill=color, outline=None, width=0)
+
+    def draw_square(self, position=None, side_length=None, color=(0, 0, 0, 255)):
+        if not position:
+            position = self.center
+        else:
+            position = Point(*position)
+        if not side_length:
+            side_length = min(self.width, self.height) / 4
+
+        top_left = position + (side_length / 2) * Vector.up() + (side_length / 2) * Vector.left()
+        bottom_right = position + (side_length / 2) * Vector.down() + (side_length / 2) * Vector.right()
+
+        self.draw.rectangle([top_left, bottom_right], fill=color, width=0)
+
+    def draw_letter(self, letter="A", location=None, color=(0, 0, 0, 255), mirror=False, angle=0, font=None, size=None):
+        if not location:
+            location = self.center
+        if not size:
+            size = min(self.width, self.height) // 3
+        if not font:
+            font = DEFAULT_FONT
+        if isinstance(font, str):
+            font = ImageFont.truetype(font, size)
+
+        # the letter is drawn on a transparent layer of the full image size, mirrored and rotated about its center
+        letter_image = Image.new(mode="RGBA", size=self.size, color=(255, 255, 255, 0))
+        letter_draw = ImageDraw.Draw(letter_image)
+        letter_draw.text(tuple(location), letter, fill=color, font=font, anchor="mm")
+
+        if mirror:
+            letter_image = ImageOps.mirror(letter_image)
+        letter_image = letter_image.rotate(angle)
+
+        self.image = Image.alpha_composite(self.image, letter_image)
+        self.draw = ImageDraw.Draw(self.image, mode="RGBA")
+
+    def draw_checker_pattern(self, color=(100, 100, 100, 100)):
+        # every pixel whose coordinates are both even or both odd gets the color
+        y, x = np.indices((self.height, self.width))
+        checker = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+        checker[(x + y) % 2 == 0] = color
+
+        self.image = Image.alpha_composite(self.image, Image.fromarray(checker, mode="RGBA"))
+        self.draw = ImageDraw.Draw(self.image, mode="RGBA")
+
+
+class ReferenceSymmetrySpan(ReferenceCanvas):
+    def draw_squares(self, color=(0, 0, 0, 255)):
+        # how many pixels high/wide the rows/columns are
+        col_step = self.width / self.cols
+        row_step = self.height / self.rows
+
+        for row in range(self.rows):
+            for col in range(self.cols):
+                if self.squares[row][col] == 1:
+                    position = Point((col * col_step) + (col_step / 2), (row * row_step) + (row_step / 2))
+                    self.draw_square(position=position, side_length=row_step, color=color)
+
+    def draw_grid(self, rows=None, cols=None, color=(0, 0, 0, 255), line_thickness=None):
+        super(ReferenceSymmetrySpan, self).draw_grid(rows=self.rows, cols=self.cols, color=color)
+
+
+class ReferenceDotSpan(ReferenceCanvas):
+    def draw_dots(self, color=(0, 0, 0, 255)):
+        # how many pixels high/wide the rows/columns are
+        col_step = self.width / self.cols
+        row_step = self.height / self.rows
+
+        for row in range(self.rows):
+            for col in range(self.cols):
+                if self.dots[row][col] == 1:
+                    center = Point((col * col_step) + (col_step / 2), (row * row_step) + (row_step / 2))
+                    self.draw_dot(center=center, radius=row_step / 2, color=color)
+
+    def draw_grid(self, rows=None, cols=None, color=(0, 0, 0, 255), line_thickness=None):
+        super(ReferenceDotSpan, self).draw_grid(rows=self.rows, cols=self.cols, color=color)
+
+
+# reference implementation of each paradigm's drawing methods
+REFERENCE_CLASSES = {ArrowSpan: ReferenceCanvas, RotationSpan: ReferenceCanvas, DotSpan: ReferenceDotSpan,
+                     SymmetrySpan: ReferenceSymmetrySpan}
+
+
+def render_reference(scene, size=None):
+    """
+    Draws a scene with the reference implementation of its paradigm, scaling the arguments like Scene.render.
+
+    :param scene: Scene
+    :param size: Size of the image, by default the scene's reference size
+    :returns: RGBA image
+    """
+
+    if size is None:
+        size = scene.size
+    size = (int(size[0]), int(size[1]))
+
+    canvas = REFERENCE_CLASSES.get(scene.cls, ReferenceCanvas)(size=size, background_color=scene.background_color,
+                                                                name=scene.name)
+    for key, value in scene.state.items():
+        setattr(canvas, key, value)
+
+    for method, kwargs, lengths, points in scene.operations:
+        getattr(canvas, method)(**scene.scale_arguments(kwargs, lengths, points, size))
+
+    return canvas.image
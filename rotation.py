@@ -0,0 +1,147 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+# lossless transpositions for multiples of 90 degrees
+TRANSPOSITIONS = {90: Image.Transpose.ROTATE_90, 180: Image.Transpose.ROTATE_180, 270: Image.Transpose.ROTATE_270}
+
+
+def rotation_matrix(angle, size):
+    """
+    Calculates the affine matrix Image.rotate uses to rotate an image of the given size about its center. The matrix
+    maps destination pixels to source pixels.
+
+    :param angle: Angle of the rotation (counterclockwise, in degrees)
+    :param size: Size (width, height) of the image
+    :returns: Affine matrix as a tuple (a, b, c, d, e, f)
+    """
+
+    center_x, center_y = size[0] / 2, size[1] / 2
+    angle = -math.radians(angle)
+
+    a, b = round(math.cos(angle), 15), round(math.sin(angle), 15)
+    d, e = round(-math.sin(angle), 15), round(math.cos(angle), 15)
+    c = a * -center_x + b * -center_y + center_x
+    f = d * -center_x + e * -center_y + center_y
+
+    return a, b, c, d, e, f
+
+
+def fixed_point(value):
+    # 16.16 fixed point, rounded like Pillow does
+    return math.floor(value * 65536.0 + 0.5)
+
+
+class Rotation:
+    """
+    Rotation about the center of an image of a fixed size, applied to layers covering only part of the image. The
+    result matches the corresponding region of Image.rotate applied to the full image pixel by pixel. Everything that
+    only depends on the angle and the size is computed once, when the rotation is created (see rotation).
+    """
+
+    def __init__(self, angle, size):
+        """
+        :param angle: Angle of the rotation (counterclockwise, in degrees)
+        :param size: Size (width, height) of the full image
+        """
+
+        self.angle = angle % 360.0
+        self.size = tuple(size)
+
+        # the same lossless fast paths Image.rotate takes
+        self.transposition = None
+        if self.angle == 180 or (self.angle in (90, 270) and size[0] == size[1]):
+            self.transposition = TRANSPOSITIONS[self.angle]
+
+        self.matrix = rotation_matrix(self.angle, self.size)
+        a, b, c, d, e, f = self.matrix
+
+        # Pillow samples the nearest neighbour in 16.16 fixed point, relative to the full image. Doing the same for a
+        # layer (instead of transforming it with a shifted matrix) reproduces the full rotation.
+        self.fixed = (fixed_point(a), fixed_point(b), fixed_point(c + a * 0.5 + b * 0.5),
+                      fixed_point(d), fixed_point(e), fixed_point(f + d * 0.5 + e * 0.5))
+
+    def box(self, offset, layer_size):
+        """
+        Bounding box of a rotated layer, clipped to the image.
+
+        :param offset: Position (left, top) of the layer within the full image
+        :param layer_size: Size (width, height) of the layer
+        :returns: Box (left, top, right, bottom), or None if the layer is rotated out of the image
+        """
+
+        width, height = self.size
+        left, top = offset
+        a, b, c, d, e, f = self.matrix
+
+        # invert the matrix to find where the corners of the layer end up
+        determinant = a * e - b * d
+        xs, ys = [], []
+        for x, y in ((left, top), (left + layer_size[0], top), (left, top + layer_size[1]),
+                     (left + layer_size[0], top + layer_size[1])):
+            xs.append((e * (x - c) - b * (y - f)) / determinant)
+            ys.append((a * (y - f) - d * (x - c)) / determinant)
+
+        box_left, box_top = max(0, math.floor(min(xs)) - 1), max(0, math.floor(min(ys)) - 1)
+        box_right, box_bottom = min(width, math.ceil(max(xs)) + 1), min(height, math.ceil(max(ys)) + 1)
+        if box_right <= box_left or box_bottom <= box_top:
+            return None
+
+        return box_left, box_top, box_right, box_bottom
+
+    def __call__(self, layer, offset):
+        """
+        Rotates a layer placed at offset within a transparent image of the rotation's size.
+
+        :param layer: RGBA image
+        :param offset: Position (left, top) of the layer within the full image
+        :returns: Rotated layer and its position within the full image, or None if it was rotated out of the image
+        """
+
+        width, height = self.size
+        left, top = offset
+        layer_width, layer_height = layer.size
+
+        if self.angle == 0:
+            return layer, offset
+        if self.transposition is not None:
+            rotated = layer.transpose(self.transposition)
+            if self.angle == 90:
+                return rotated, (top, width - left - layer_width)
+            if self.angle == 180:
+                return rotated, (width - left - layer_width, height - top - layer_height)
+            return rotated, (height - top - layer_height, left)
+
+        box = self.box(offset, layer.size)
+        if box is None:
+            return None
+        box_left, box_top, box_right, box_bottom = box
+
+        a, b, c, d, e, f = self.fixed
+        xs = np.arange(box_left, box_right)[None, :]
+        ys = np.arange(box_top, box_bottom)[:, None]
+        source_xs = ((c + ys * b + xs * a) >> 16) - left
+        source_ys = ((f + ys * e + xs * d) >> 16) - top
+
+        # a transparent border catches the pixels sampled outside the layer, each pixel is gathered as one 32 bit value
+        pixels = np.zeros((layer_height + 2, layer_width + 2), dtype=np.uint32)
+        pixels[1:-1, 1:-1] = np.asarray(layer).view(np.uint32)[:, :, 0]
+        rotated = pixels[np.clip(source_ys + 1, 0, layer_height + 1), np.clip(source_xs + 1, 0, layer_width + 1)]
+
+        return Image.fromarray(rotated.view(np.uint8).reshape(rotated.shape + (4,)), mode="RGBA"), (box_left, box_top)
+
+
+@lru_cache(maxsize=1024)
+def rotation(angle, size):
+    """
+    Rotation of an image of the given size. Rotations are cached, so they are only set up once per angle and size.
+
+    :param angle: Angle of the rotation (counterclockwise, in degrees)
+    :param size: Size (width, height) of the image
+    :returns: Rotation
+    """
+
+    return Rotation(angle, size)
+
@@ -1,10 +1,13 @@
+from atlas import save_atlas_sets
 from canvas import Canvas
+from pools import DEFAULT_BUDGET, LazyPool
+from scene import Scene, save_scenes
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
 
 class RotationSpan(Canvas):
-    def __init__(self, size=(1210, 1210), mode="RGBA", background_color=(255, 255, 255, 255), name="arrow_span"):
+    def __init__(self, size=(1210, 1210), mode="auto", background_color=(255, 255, 255, 255), name="arrow_span"):
         super(RotationSpan, self).__init__(size=size, mode=mode, background_color=background_color, name=name)
 
     @staticmethod
@@ -22,42 +25,73 @@ class RotationSpan(Canvas):
                 "font": font}
 
     @classmethod
-    def create_all_letters(cls, config=None):
+    def create_letter_scenes(cls, config=None):
         if not config:
             config = cls.create_config()
 
         letters = []
         for letter in config["letters"]:
             for angle in config["angles"]:
-                new_letter = cls(size=config["image_size"], background_color=config["background_color"],
-                                 name=f"letter_{letter}_{angle}")
-                new_letter.draw_letter(letter=letter, location=config["letter_location"], color=config["letter_color"],
-                                       mirror=False, angle=angle, font=config["font"], size=config["font_size"])
-                letters.append(new_letter)
-
-                new_letter = cls(size=config["image_size"], background_color=config["background_color"],
-                                 name=f"letter_{letter}_{angle}")
-                new_letter.draw_letter(letter=letter, location=config["letter_location"], color=config["letter_color"],
-                                       mirror=True, angle=angle, font=config["font"], size=config["font_size"])
-                letters.append(new_letter)
+                for mirror in (False, True):
+                    new_letter = Scene(cls, config["image_size"], name=f"letter_{letter}_{angle}",
+                                       background_color=config["background_color"])
+                    new_letter.add("draw_letter", lengths=("size",), points=("location",), letter=letter,
+                                   location=config["letter_location"], color=config["letter_color"], mirror=mirror,
+                                   angle=angle, font=config["font"], size=config["font_size"])
+                    letters.append(new_letter)
 
         return np.array(letters)
 
     @classmethod
-    def create_set(cls, letters, set_size=6, name="set"):
-        letter_set = np.random.choice(letters, set_size)
+    def create_all_letters(cls, config=None, budget=DEFAULT_BUDGET):
+        # the letters are only drawn when they are first used
+        return LazyPool(cls.create_letter_scenes(config), budget=budget)
 
-        for i, letter in enumerate(letter_set):
-            letter.name = f"{name}_{i}"
+    @classmethod
+    def create_set(cls, letters, set_size=6, name="set"):
+        # the pool's members are shared between sets, so the members' names are returned alongside them
+        letter_set = letters.choice(set_size)
 
-        return letter_set
+        return [(f"{name}_{i}", letters[index]) for i, index in enumerate(letter_set)]
 
     @classmethod
-    def create_batch(cls, batch_size=12, set_sizes=(2, 3, 4, 5), folder="rotation_span/", config=None):
-        letters = cls.create_all_letters(config)
-        for i in range(batch_size):
+    def create_scenes(cls, batch_size=12, set_sizes=(2, 3, 4, 5), folder="rotation_span/", config=None, seed=None,
+                      indices=None, letters=None, budget=DEFAULT_BUDGET):
+        if indices is None:
+            indices = range(batch_size)
+
+        # sets are drawn from the given pool, e.g. one shared by several calls (see batch.shared_pools)
+        if letters is None:
+            letters = cls.create_all_letters(config, budget)
+        for i in indices:
+            if seed is not None:
+                cls.seed_random(seed, i)
+
             set_size = set_sizes[i % len(set_sizes)]
 
             new_set = cls.create_set(letters, set_size, name=f"set{i}")
-            for arrow in new_set:
-                arrow.save(path=folder)
+            for name, letter in new_set:
+                yield f"{folder}{name}", letter
+
+    @classmethod
+    def create_batch(cls, batch_size=12, set_sizes=(2, 3, 4, 5), folder="rotation_span/", config=None, seed=None,
+                     indices=None, sink=None, save_options=None, image_sizes=None, supersample=1, letters=None,
+                     atlas=False, budget=DEFAULT_BUDGET):
+        # the pool is saved once as an atlas image, each set as an index of its regions (see atlas.py)
+        if atlas:
+            # the indices may be an iterator, they are read once
+            indices = list(range(batch_size) if indices is None else indices)
+            if letters is None:
+                letters = cls.create_all_letters(config, budget)
+
+            sets = {}
+            for index in indices:
+                sets[index] = list(cls.create_scenes(batch_size=batch_size, set_sizes=set_sizes, folder=folder,
+                                                     config=config, seed=seed, indices=[index], letters=letters))
+            save_atlas_sets(letters, sets, folder=folder, sink=sink, save_options=save_options, image_sizes=image_sizes,
+                            supersample=supersample, save_atlas=0 in indices)
+            return
+
+        scenes = cls.create_scenes(batch_size=batch_size, set_sizes=set_sizes, folder=folder, config=config, seed=seed,
+                                   indices=indices, letters=letters, budget=budget)
+        save_scenes(scenes, sizes=image_sizes, sink=sink, supersample=supersample, save_options=save_options)
@@ -0,0 +1,97 @@
+import numpy as np
+
+
+def corners(rows, cols):
+    return [(0, 0), (rows - 1, 0), (0, cols - 1), (rows - 1, cols - 1)]
+
+
+def region_masks(rows, cols, starts, size=None, exclude=None):
+    """
+    Marks the cells of rectangular regions of a grid, e.g. the subgrids dots may be placed in.
+
+    :param rows: Number of rows of the grid
+    :param cols: Number of columns of the grid
+    :param starts: Array of (row, col) pairs, the top left cells of the regions
+    :param size: Number of rows and columns of the regions, by default the whole grid
+    :param exclude: List of (row, col) pairs that are never marked
+    :returns: Boolean array with shape (number of regions, rows, cols)
+    """
+
+    if size is None:
+        size = (rows, cols)
+
+    starts = np.asarray(starts).reshape(-1, 2)
+    row_index = np.arange(rows)[None, :, None]
+    col_index = np.arange(cols)[None, None, :]
+    first_row = starts[:, 0, None, None]
+    first_col = starts[:, 1, None, None]
+
+    masks = ((row_index >= first_row) & (row_index < first_row + size[0]) &
+             (col_index >= first_col) & (col_index < first_col + size[1]))
+
+    for row, col in exclude or ():
+        masks[:, row, col] = False
+
+    return masks
+
+
+def sample_cells(masks, n):
+    """
+    Draws n different cells from each mask, every set of n valid cells being equally likely. All masks are sampled in
+    one vectorized step, the time doesn't depend on how many of the cells are taken.
+
+    :param masks: Boolean array with shape (number of masks, rows, cols) marking the valid cells
+    :param n: Number of cells drawn from each mask
+    :returns: Array of flat cell indices (row * cols + col) with shape (number of masks, n)
+    """
+
+    flat = masks.reshape(len(masks), -1)
+    if n > flat.shape[1] or (len(flat) and n > flat.sum(axis=1).min()):
+        raise ValueError(f"Can't draw {n} different cells from a mask with {flat.sum(axis=1).min()} valid cells!")
+    if n == 0:
+        return np.zeros((len(flat), 0), dtype=int)
+
+    # the n smallest of independent uniform keys are a uniformly random subset, invalid cells are never among them
+    keys = np.random.random_sample(flat.shape)
+    keys[~flat] = 2
+
+    return np.argpartition(keys, n - 1, axis=1)[:, :n]
+
+
+def random_starts(count, rows, cols, size):
+    """
+    Draws the top left cells of regions placed uniformly at random within a grid.
+
+    :param count: Number of regions
+    :param rows: Number of rows of the grid
+    :param cols: Number of columns of the grid
+    :param size: Number of rows and columns of the regions
+    :returns: Array of (row, col) pairs with shape (count, 2)
+    """
+
+    if size[0] > rows or size[1] > cols:
+        raise ValueError("Subgrid is too big!")
+
+    return np.column_stack((np.random.randint(0, rows - size[0] + 1, count),
+                            np.random.randint(0, cols - size[1] + 1, count)))
+
+
+def max_cells(rows, cols, size=None, exclude=None):
+    """
+    Number of cells that can be drawn from every placement of a region, i.e. the largest n that never fails.
+
+    :param rows: Number of rows of the grid
+    :param cols: Number of columns of the grid
+    :param size: Number of rows and columns of the region, by default the whole grid
+    :param exclude: List of (row, col) pairs that are never drawn
+    :returns: Number of cells
+    """
+
+    if size is None:
+        size = (rows, cols)
+    if size[0] > rows or size[1] > cols:
+        raise ValueError("Subgrid is too big!")
+
+    starts = np.argwhere(np.ones((rows - size[0] + 1, cols - size[1] + 1)))
+
+    return int(region_masks(rows, cols, starts, size, exclude).sum(axis=(1, 2)).min())
@@ -0,0 +1,172 @@
+import numpy as np
+from PIL import Image, ImageDraw
+
+from sinks import DirectorySink
+
+
+class Scene:
+    """
+    Resolution independent description of a stimulus: the paradigm class, the attributes its drawing methods read (e.g.
+    the dots of a DotSpan) and the drawing calls. Lengths and positions are given for a reference size and scaled to the
+    size the scene is rendered at. At the reference size, the calls are made with exactly the recorded arguments.
+    """
+
+    def __init__(self, cls, size, name, background_color=(255, 255, 255, 255), state=None):
+        """
+        :param cls: Canvas class the scene is rendered with
+        :param size: Reference size the lengths and positions are given for
+        :param name: Name of the rendered canvases
+        :param background_color: Background color
+        :param state: Dict of attributes set on the canvas before drawing, they must not depend on the size
+        """
+
+        self.cls = cls
+        self.size = tuple(size)
+        self.name = name
+        self.background_color = background_color
+        self.state = state or {}
+
+        # (method name, keyword arguments, names of lengths, names of positions)
+        self.operations = []
+        # (scene, size, supersample, extension, options) -> (encoded bytes, filename of the first file written), see
+        # save. Scenes of a pools.LazyPool share the pool's bounded cache instead.
+        self.files = {}
+
+    def add(self, method, lengths=(), points=(), **kwargs):
+        """
+        Records a call of a drawing method.
+
+        :param method: Name of the method, e.g. "draw_radial_arrow"
+        :param lengths: Names of the arguments that are lengths in pixels, scaled with the shorter side of the image
+        :param points: Names of the arguments that are positions in pixels, scaled with the width and height
+        :param kwargs: Arguments of the method
+        :returns: The scene, so calls can be chained
+        """
+
+        self.operations.append((method, kwargs, tuple(lengths), tuple(points)))
+        return self
+
+    def scale_arguments(self, kwargs, lengths, points, size):
+        if size == self.size:
+            return kwargs
+
+        scale = min(size) / min(self.size)
+        scale_x = size[0] / self.size[0]
+        scale_y = size[1] / self.size[1]
+
+        kwargs = dict(kwargs)
+        for key in lengths:
+            value = kwargs.get(key)
+            if isinstance(value, (int, np.integer)):
+                # integer lengths like line thicknesses and font sizes stay integers
+                kwargs[key] = max(1, round(value * scale))
+            elif value:
+                kwargs[key] = value * scale
+        for key in points:
+            value = kwargs.get(key)
+            if value:
+                kwargs[key] = (value[0] * scale_x, value[1] * scale_y)
+
+        return kwargs
+
+    def render(self, size=None, supersample=1):
+        """
+        Draws the scene.
+
+        :param size: Size of the image, by default the reference size
+        :param supersample: Factor the scene is drawn larger by before it is reduced to the size, for anti-aliasing
+        :returns: Canvas of the scene's class
+        """
+
+        if size is None:
+            size = self.size
+        size = (int(size[0]), int(size[1]))
+        draw_size = (size[0] * supersample, size[1] * supersample)
+
+        canvas = self.cls(size=draw_size, background_color=self.background_color, name=self.name)
+        for key, value in self.state.items():
+            setattr(canvas, key, value)
+
+        for method, kwargs, lengths, points in self.operations:
+            getattr(canvas, method)(**self.scale_arguments(kwargs, lengths, points, draw_size))
+
+        if supersample == 1:
+            return canvas
+
+        reduced = self.cls(size=size, background_color=self.background_color, name=self.name)
+        for key, value in self.state.items():
+            setattr(reduced, key, value)
+        # 1-bit images are only resized with nearest neighbour sampling
+        image = canvas.image.convert("L") if canvas.image.mode == "1" else canvas.image
+        reduced.image = image.resize(size, Image.Resampling.BOX)
+        reduced.mode = reduced.image.mode
+        reduced.draw = ImageDraw.Draw(reduced.image, mode=reduced.mode)
+
+        return reduced
+
+    def save(self, sink, filename, size=None, supersample=1, extension="png", **options):
+        """
+        Renders and saves the scene. The encoded image is kept with the scene, so saving it again, e.g. as another
+        member of a set drawn from a stimulus pool, links to the first file instead of drawing and encoding it again.
+
+        :param sink: Sink to save to (see sinks.py)
+        :param filename: Filename within the sink, with extension
+        :param size: Size of the image, by default the reference size
+        :param supersample: See render
+        :param extension: Filename extension determining the image format.
+        :param options: Options of the encoder (see encoding.encode_image)
+        :returns: None
+        """
+
+        if size is None:
+            size = self.size
+        key = (self, tuple(size), supersample, extension, tuple(sorted(options.items())))
+
+        if key not in self.files:
+            data = sink.encode(self.render(size, supersample=supersample).image, extension, **options)
+            sink.write(filename, data)
+            self.files[key] = (data, filename)
+            return
+
+        data, first_filename = self.files[key]
+        if filename != first_filename:
+            sink.link(filename, first_filename, data)
+
+    def __repr__(self):
+        return f"Scene({self.cls.__name__}, {self.name}, {len(self.operations)} operations)"
+
+
+def size_folder(size):
+    return f"{size[0]}x{size[1]}/"
+
+
+def save_scenes(scenes, sizes=None, sink=None, supersample=1, save_options=None):
+    """
+    Renders scenes at several sizes and saves them. Scenes appearing under several filenames, like the members of a
+    stimulus pool, are drawn and encoded once per size (see Scene.save).
+
+    :param scenes: Iterable of (filename without extension, scene) pairs, e.g. from a paradigm's create_scenes
+    :param sizes: List of sizes, the files of each size are saved in a folder named after the size, e.g. "600x600/". By
+                  default, each scene is saved once at its reference size without such a folder.
+    :param sink: Sink to save to (see sinks.py), by default each file is written to its folder
+    :param supersample: See Scene.render
+    :param save_options: Arguments of Canvas.save like extension and depth
+    :returns: None
+    """
+
+    if sink is None:
+        sink = DirectorySink()
+    if save_options is None:
+        save_options = {}
+
+    options = dict(save_options)
+    extension = options.pop("extension", "png")
+
+    for filename, scene in scenes:
+        if sizes is None:
+            scene.save(sink, f"{filename}.{extension}", supersample=supersample, extension=extension, **options)
+            continue
+
+        for size in sizes:
+            scene.save(sink, f"{size_folder(size)}{filename}.{extension}", size=size, supersample=supersample,
+                       extension=extension, **options)
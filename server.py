@@ -0,0 +1,429 @@
+import argparse
+import inspect
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from arrow_span import ArrowSpan
+from dot_span import DotSpan
+from encoding import encode_image
+from pools import DEFAULT_BUDGET, ByteCache
+from rotation_span import RotationSpan
+from symmetry_span import SymmetrySpan
+
+PARADIGMS = {"arrow_span": ArrowSpan, "rotation_span": RotationSpan, "dot_span": DotSpan,
+             "symmetry_span": SymmetrySpan}
+CONTENT_TYPES = {"png": "image/png", "webp": "image/webp"}
+
+# largest side of an image the server draws, including supersampling
+MAX_SIDE = 8192
+
+
+def parse_request(query):
+    """
+    Reads the parameters of a stimulus from a query string, e.g. "paradigm=dot_span&seed=1&set=3&item=2&size=600".
+    The same paradigm, seed and set give the same stimuli as main.py --seed:
+
+    - paradigm: arrow_span, rotation_span, dot_span or symmetry_span
+    - seed: Root seed of the batch
+    - set: Index of the set (arrow and rotation span) or stimulus (dot and symmetry span) within the batch
+    - item: Member of the set (arrow and rotation span) or frame of the stimulus (dot span), 0 by default
+    - size: Width, or width and height as in 600x400, by default the paradigm's size
+    - format: png (default) or webp
+    - supersample: See Scene.render, 1 by default
+
+    :param query: Query string
+    :returns: Dict of the parameters
+    """
+
+    values = {key: value[-1] for key, value in parse_qs(query, strict_parsing=bool(query)).items()}
+
+    def number(key, default=None):
+        if key not in values:
+            if default is None:
+                raise ValueError(f"Missing parameter {key}!")
+            return default
+        if not values[key].isdigit():
+            raise ValueError(f"Parameter {key} must be a non-negative integer, not {values[key]!r}!")
+        return int(values[key])
+
+    request = {"paradigm": values.get("paradigm"), "seed": number("seed"), "set": number("set"),
+               "item": number("item", 0), "size": None, "format": values.get("format", "png"),
+               "supersample": number("supersample", 1)}
+
+    if request["paradigm"] not in PARADIGMS:
+        raise ValueError(f"Unknown paradigm {request['paradigm']!r}, use one of {', '.join(PARADIGMS)}!")
+    if request["format"] not in CONTENT_TYPES:
+        raise ValueError(f"Unknown format {request['format']!r}, use one of {', '.join(CONTENT_TYPES)}!")
+
+    if "size" in values:
+        sides = values["size"].split("x")
+        if len(sides) > 2 or not all(side.isdigit() and int(side) > 0 for side in sides):
+            raise ValueError(f"Size must be a width or width x height, not {values['size']!r}!")
+        request["size"] = (int(sides[0]), int(sides[-1]))
+
+    if request["supersample"] < 1:
+        raise ValueError("Parameter supersample must be at least 1!")
+    # without a size, the paradigm's size is checked once it is known, see Stimuli.key
+    if request["size"]:
+        check_size(request["size"], request["supersample"])
+
+    return request
+
+
+def check_size(size, supersample):
+    """
+    Rejects images larger than the server draws.
+
+    :param size: Size (width, height) of the image
+    :param supersample: See Scene.render
+    :returns: None
+    """
+
+    if max(size) * supersample > MAX_SIDE:
+        raise ValueError(f"Images are drawn at most {MAX_SIDE} pixels wide and high!")
+
+
+class Stimuli:
+    """
+    Turns requests into scenes of the paradigms and renders them. The arrow and letter pools are created once, so the
+    members of sets of all seeds are the same scenes, and a pool scene is rendered once per size and format.
+    """
+
+    def __init__(self):
+        self.pools = {"arrow_span": ArrowSpan.create_all_arrows(), "rotation_span": RotationSpan.create_all_letters()}
+        self.pool_indices = {paradigm: {scene: i for i, scene in enumerate(scenes)}
+                             for paradigm, scenes in self.pools.items()}
+
+        # the paradigms draw their stimuli from NumPy's global random state
+        self.random_lock = threading.Lock()
+
+    def scenes(self, paradigm, seed, index):
+        """
+        The scenes of one set or stimulus, as create_batch draws them.
+
+        :param paradigm: Name of the paradigm
+        :param seed: Root seed of the batch
+        :param index: Index of the set or stimulus within the batch
+        :returns: List of (filename without extension, scene) pairs
+        """
+
+        kwargs = {"seed": seed, "indices": [index]}
+        if paradigm == "arrow_span":
+            kwargs["arrows"] = self.pools[paradigm]
+        elif paradigm == "rotation_span":
+            kwargs["letters"] = self.pools[paradigm]
+
+        with self.random_lock:
+            return list(PARADIGMS[paradigm].create_scenes(**kwargs))
+
+    def key(self, request):
+        """
+        Cache key of a request, which fully describes the image. Requests for the same member of a pool share a key.
+
+        :param request: Dict of parameters (see parse_request)
+        :returns: Tuple (paradigm, stimulus..., width, height, supersample, format)
+        """
+
+        paradigm = request["paradigm"]
+        size = request["size"]
+
+        if paradigm in self.pools:
+            scenes = self.scenes(paradigm, request["seed"], request["set"])
+            if request["item"] >= len(scenes):
+                raise LookupError(f"Set {request['set']} only has {len(scenes)} items!")
+            scene = scenes[request["item"]][1]
+            stimulus = ("pool", self.pool_indices[paradigm][scene])
+            size = size or scene.size
+        else:
+            stimulus = (request["seed"], request["set"], request["item"])
+            size = size or inspect.signature(PARADIGMS[paradigm].create_scenes).parameters["image_size"].default
+        check_size(size, request["supersample"])
+
+        return (paradigm,) + stimulus + (size[0], size[1], request["supersample"], request["format"])
+
+    def scene(self, key):
+        paradigm = key[0]
+        if key[1] == "pool":
+            return self.pools[paradigm][key[2]]
+
+        seed, index, item = key[1:4]
+        scenes = self.scenes(paradigm, seed, index)
+        if item >= len(scenes):
+            raise LookupError(f"Stimulus {index} only has {len(scenes)} items!")
+
+        return scenes[item][1]
+
+    def render(self, key):
+        """
+        Draws and encodes the image of a key.
+
+        :param key: See key
+        :returns: Encoded image as bytes
+        """
+
+        width, height, supersample, extension = key[-4:]
+        canvas = self.scene(key).render((width, height), supersample=supersample)
+
+        return encode_image(canvas.image, extension)
+
+
+class DiskCache:
+    """
+    Folder of encoded images that evicts the least recently used files once their total size exceeds a byte budget.
+    Files of earlier runs are reused, in the order they were last used.
+    """
+
+    def __init__(self, root, budget=16 * DEFAULT_BUDGET):
+        """
+        :param root: Folder of the cache
+        :param budget: Maximum total size of the files in bytes
+        """
+
+        self.root = root
+        self.budget = budget
+        self.size = 0
+        self.lock = threading.Lock()
+
+        # path -> size, least recently used first
+        self.entries = OrderedDict()
+        files = []
+        for folder, _, names in os.walk(root):
+            for name in names:
+                path = os.path.join(folder, name)
+                if not name.endswith(".tmp"):
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(files):
+            self.entries[path] = size
+            self.size += size
+
+        self.remove(self.evict())
+
+    def path(self, key):
+        # e.g. dot_span/1_3_2_600_600_1.png
+        paradigm, *parts, extension = key
+        return os.path.join(self.root, paradigm, "_".join(str(part) for part in parts) + f".{extension}")
+
+    def get(self, key):
+        path = self.path(key)
+        with self.lock:
+            if path not in self.entries:
+                return None
+            self.entries.move_to_end(path)
+
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            # the modification time keeps the order across runs
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.size -= self.entries.pop(path, 0)
+            return None
+
+        return data
+
+    def put(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # other threads never see partially written files
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+
+        with self.lock:
+            self.size -= self.entries.pop(path, 0)
+            self.entries[path] = len(data)
+            self.size += len(data)
+            evicted = self.evict()
+
+        self.remove(evicted)
+
+    def evict(self):
+        # paths of the least recently used files beyond the budget, call with the lock held
+        evicted = []
+        while self.size > self.budget:
+            path, size = self.entries.popitem(last=False)
+            self.size -= size
+            evicted.append(path)
+
+        return evicted
+
+    @staticmethod
+    def remove(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+# Stimuli of a worker process
+_stimuli = None
+
+
+def _start_worker():
+    global _stimuli
+    _stimuli = Stimuli()
+
+
+def _render_key(key):
+    return _stimuli.render(key)
+
+
+class StimulusServer(ThreadingHTTPServer):
+    """
+    HTTP server rendering stimuli on request, see StimulusHandler. Encoded images are kept in an in-memory and an
+    optional on-disk LRU cache. Each request is handled on its own thread, images are rendered either on that thread or
+    by a pool of worker processes.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, memory_budget=DEFAULT_BUDGET, cache_dir=None, disk_budget=16 * DEFAULT_BUDGET,
+                 workers=0):
+        """
+        :param address: Pair of host and port
+        :param memory_budget: Bytes of encoded images kept in memory
+        :param cache_dir: Folder of the on-disk cache, by default images are only cached in memory
+        :param disk_budget: Bytes of encoded images kept on disk
+        :param workers: Number of worker processes rendering images, 0 renders on the request threads
+        """
+
+        super(StimulusServer, self).__init__(address, StimulusHandler)
+
+        self.stimuli = Stimuli()
+        self.memory = ByteCache(memory_budget)
+        self.memory_lock = threading.Lock()
+        self.disk = DiskCache(cache_dir, disk_budget) if cache_dir else None
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_start_worker) if workers else None
+
+    def render(self, key):
+        if self.executor is None:
+            return self.stimuli.render(key)
+        return self.executor.submit(_render_key, key).result()
+
+    def get(self, request):
+        """
+        Encoded image of a request, from the caches if possible.
+
+        :param request: Dict of parameters (see parse_request)
+        :returns: Pair of the encoded image and where it came from: "memory", "disk" or "render"
+        """
+
+        key = self.stimuli.key(request)
+
+        with self.memory_lock:
+            if key in self.memory:
+                return self.memory[key], "memory"
+
+        data = self.disk.get(key) if self.disk else None
+        source = "disk"
+        if data is None:
+            data = self.render(key)
+            source = "render"
+            if self.disk:
+                self.disk.put(key, data)
+
+        with self.memory_lock:
+            self.memory[key] = data
+
+        return data, source
+
+    def warm(self, sizes=(None,), formats=("png",)):
+        """
+        Renders all members of the arrow and letter pools into the memory cache.
+
+        :param sizes: Sizes to render, None being the pools' size
+        :param formats: Formats to render
+        :returns: Number of images
+        """
+
+        keys = []
+        for paradigm, scenes in self.stimuli.pools.items():
+            for i, scene in enumerate(scenes):
+                for size in sizes:
+                    size = size or scene.size
+                    keys.extend((paradigm, "pool", i, size[0], size[1], 1, extension) for extension in formats)
+
+        if self.executor is None:
+            images = map(self.stimuli.render, keys)
+        else:
+            images = self.executor.map(_render_key, keys, chunksize=8)
+
+        with self.memory_lock:
+            for key, data in zip(keys, images):
+                self.memory[key] = data
+
+        return len(keys)
+
+    def server_close(self):
+        super(StimulusServer, self).server_close()
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+class StimulusHandler(BaseHTTPRequestHandler):
+    """
+    Serves GET /stimulus?paradigm=...&seed=...&set=... (see parse_request). The X-Cache header tells whether the image
+    came from memory, disk or was rendered.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/stimulus":
+            self.send_error(HTTPStatus.NOT_FOUND, "Use /stimulus?paradigm=...&seed=...&set=...")
+            return
+
+        try:
+            request = parse_request(url.query)
+            data, source = self.server.get(request)
+        except ValueError as error:
+            self.send_error(HTTPStatus.BAD_REQUEST, str(error))
+            return
+        except LookupError as error:
+            self.send_error(HTTPStatus.NOT_FOUND, str(error))
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", CONTENT_TYPES[request["format"]])
+        self.send_header("Content-Length", str(len(data)))
+        # the parameters determine the image
+        self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        self.send_header("X-Cache", source)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Renders stimuli on request, see server.parse_request for the "
+                                                 "parameters of GET /stimulus.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on (default: 8000)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of worker processes rendering images (default: 0, render on the request threads)")
+    parser.add_argument("--memory-budget", type=int, default=DEFAULT_BUDGET // 2 ** 20,
+                        help=f"MiB of encoded images cached in memory (default: {DEFAULT_BUDGET // 2 ** 20})")
+    parser.add_argument("--cache-dir", default=None,
+                        help="also cache encoded images in this folder, which is reused by later runs")
+    parser.add_argument("--disk-budget", type=int, default=16 * DEFAULT_BUDGET // 2 ** 20,
+                        help=f"MiB of encoded images cached on disk (default: {16 * DEFAULT_BUDGET // 2 ** 20})")
+    parser.add_argument("--warm-sizes", type=int, nargs="*", default=None,
+                        help="render the arrow and letter pools at these widths and heights at startup (default: the "
+                             "pools' size)")
+    args = parser.parse_args()
+
+    server = StimulusServer((args.host, args.port), memory_budget=args.memory_budget * 2 ** 20,
+                            cache_dir=args.cache_dir, disk_budget=args.disk_budget * 2 ** 20, workers=args.workers)
+    with server:
+        sizes = [(size, size) for size in args.warm_sizes] if args.warm_sizes else (None,)
+        print(f"Warmed {server.warm(sizes)} pool images")
+        print(f"Serving stimuli on http://{args.host}:{server.server_port}/stimulus")
+        server.serve_forever()
@@ -0,0 +1,370 @@
+import hashlib
+import io
+import os
+import queue
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import Future
+
+from encoding import encode_image
+
+# fixed timestamp of archive members, so the same stimuli always produce the same archive
+ARCHIVE_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+class Encoding(Future):
+    """
+    Bytes of an image that a ThreadedSink encodes on its background thread. It can be written and linked like bytes,
+    the sinks wrapped by the ThreadedSink get the bytes, and result() waits for them.
+    """
+
+    @property
+    def nbytes(self):
+        # see pools.ByteCache, which waits for the bytes before it counts them
+        if self.done() and self.exception() is None:
+            return len(self.result())
+        return 0
+
+
+def resolve(data):
+    """
+    Bytes of a file, waiting for them if they are still being encoded.
+
+    :param data: Bytes or Encoding
+    :returns: Bytes
+    """
+
+    if isinstance(data, Future):
+        return data.result()
+    return data
+
+
+class Sink:
+    """
+    Destination of saved images. Filenames are relative to the sink and may contain folders, e.g. "arrow_span/set0_0.png".
+    """
+
+    def save(self, image, filename, extension="png", **options):
+        """
+        Encodes and writes an image.
+
+        :param image: Image to save
+        :param filename: Filename within the sink
+        :param extension: Filename extension determining the image format.
+        :param options: Options of the encoder (see encoding.encode_image)
+        :returns: None
+        """
+
+        self.write(filename, self.encode(image, extension, **options))
+
+    def encode(self, image, extension="png", **options):
+        return encode_image(image, extension, **options)
+
+    def write(self, filename, data):
+        raise NotImplementedError
+
+    def link(self, filename, source, data):
+        """
+        Writes a file with the same content as a file written before.
+
+        :param filename: Filename within the sink
+        :param source: Filename of the file written before
+        :param data: Content of both files
+        :returns: None
+        """
+
+        self.write(filename, data)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class DirectorySink(Sink):
+    """
+    Writes each image to its own file, the same way Canvas.save always did.
+    """
+
+    def __init__(self, root=""):
+        """
+        :param root: Folder (with trailing separator) filenames are relative to
+        """
+
+        self.root = root
+
+    def write(self, filename, data):
+        path = f"{self.root}{filename}"
+
+        # never write into an existing file, it might be a hardlink to other stimuli
+        if os.path.lexists(path):
+            os.remove(path)
+        elif os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, "wb") as file:
+            file.write(resolve(data))
+
+    def link(self, filename, source, data):
+        path = f"{self.root}{filename}"
+        source_path = f"{self.root}{source}"
+        if os.path.abspath(path) == os.path.abspath(source_path):
+            return
+
+        if os.path.lexists(path):
+            os.remove(path)
+        elif os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        try:
+            os.link(source_path, path)
+        except OSError:
+            self.write(filename, data)
+
+
+class ArchiveSink(Sink):
+    """
+    Streams all images into a single zip or tar archive.
+    """
+
+    def __init__(self, path, archive_format=None):
+        """
+        :param path: Path of the archive
+        :param archive_format: "zip" or "tar", by default determined by the extension of path
+        """
+
+        if not archive_format:
+            archive_format = "zip" if path.endswith(".zip") else "tar"
+
+        self.archive_format = archive_format
+        if archive_format == "zip":
+            # the images are compressed already
+            self.archive = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED)
+        elif archive_format == "tar":
+            self.archive = tarfile.open(path, "w")
+        else:
+            raise ValueError(f"Unknown archive format {archive_format}! Use zip or tar.")
+
+    def write(self, filename, data):
+        data = resolve(data)
+        if self.archive_format == "zip":
+            self.archive.writestr(zipfile.ZipInfo(filename, date_time=ARCHIVE_DATE), data)
+        else:
+            info = tarfile.TarInfo(filename)
+            info.size = len(data)
+            self.archive.addfile(info, io.BytesIO(data))
+
+    def link(self, filename, source, data):
+        if self.archive_format == "zip":
+            self.write(filename, data)
+            return
+
+        info = tarfile.TarInfo(filename)
+        info.type = tarfile.LNKTYPE
+        info.linkname = source
+        self.archive.addfile(info)
+
+    def close(self):
+        self.archive.close()
+
+
+class MemorySink(Sink):
+    """
+    Keeps all written files in memory, e.g. to hand them from a worker process to the process that owns the real sink.
+    """
+
+    def __init__(self):
+        # (filename, data, filename of the source for links or None)
+        self.files = []
+
+    def write(self, filename, data):
+        self.files.append((filename, resolve(data), None))
+
+    def link(self, filename, source, data):
+        self.files.append((filename, resolve(data), source))
+
+    def replay(self, sink):
+        """
+        Writes all files kept so far to another sink, in the order they were written.
+
+        :param sink: Sink to write to
+        :returns: None
+        """
+
+        for filename, data, source in self.files:
+            if source is None:
+                sink.write(filename, data)
+            else:
+                sink.link(filename, source, data)
+
+
+class ThreadedSink(Sink):
+    """
+    Encodes and writes images on a background thread, so rendering the next image overlaps with saving the last one.
+    The queue is bounded, rendering waits when the writer falls behind. encode returns an Encoding at once, which can be
+    written and linked before the background thread has encoded it.
+    """
+
+    def __init__(self, sink, queue_size=16):
+        """
+        :param sink: Sink the background thread writes to
+        :param queue_size: Maximum number of images waiting to be written
+        """
+
+        self.sink = sink
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.thread = threading.Thread(target=self._work, daemon=True)
+        self.thread.start()
+
+    def _work(self):
+        while True:
+            task = self.queue.get()
+            if task is None:
+                return
+
+            method, args, kwargs = task
+            if self.error is not None:
+                # nobody waits forever for an image that is never encoded
+                if method == self._encode:
+                    args[0].set_exception(self.error)
+                continue
+
+            try:
+                method(*args, **kwargs)
+            except Exception as error:
+                self.error = error
+
+    def _put(self, method, *args, **kwargs):
+        if self.error is not None:
+            raise self.error
+        self.queue.put((method, args, kwargs))
+
+    def _encode(self, encoding, image, extension, **options):
+        try:
+            encoding.set_result(self.sink.encode(image, extension, **options))
+        except Exception as error:
+            encoding.set_exception(error)
+            raise
+
+    def _write(self, filename, data):
+        self.sink.write(filename, resolve(data))
+
+    def _link(self, filename, source, data):
+        self.sink.link(filename, source, resolve(data))
+
+    def save(self, image, filename, extension="png", **options):
+        # the caller may keep drawing on the image, e.g. for the next frame
+        self._put(self.sink.save, image.copy(), filename, extension, **options)
+
+    def encode(self, image, extension="png", **options):
+        encoding = Encoding()
+        self._put(self._encode, encoding, image.copy(), extension, **options)
+
+        return encoding
+
+    def write(self, filename, data):
+        self._put(self._write, filename, data)
+
+    def link(self, filename, source, data):
+        self._put(self._link, filename, source, data)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.sink.close()
+
+        if self.error is not None:
+            raise self.error
+
+
+class TimedSink(Sink):
+    """
+    Measures the time spent encoding and writing, and the number of bytes written, on the way to another sink.
+    """
+
+    def __init__(self, sink):
+        """
+        :param sink: Sink to write to
+        """
+
+        self.sink = sink
+        self.encode_time = 0.0
+        self.write_time = 0.0
+        self.bytes_written = 0
+        self.files_written = 0
+
+    def encode(self, image, extension="png", **options):
+        start = time.perf_counter()
+        data = self.sink.encode(image, extension, **options)
+        self.encode_time += time.perf_counter() - start
+
+        return data
+
+    def write(self, filename, data):
+        start = time.perf_counter()
+        self.sink.write(filename, data)
+        self.write_time += time.perf_counter() - start
+        self.bytes_written += len(resolve(data))
+        self.files_written += 1
+
+    def link(self, filename, source, data):
+        start = time.perf_counter()
+        self.sink.link(filename, source, data)
+        self.write_time += time.perf_counter() - start
+        self.files_written += 1
+
+    def close(self):
+        self.sink.close()
+
+
+class RecordingSink(Sink):
+    """
+    Records a digest of each file on the way to another sink, grouped by the stimulus being saved (see manifest.py).
+    """
+
+    def __init__(self, sink):
+        """
+        :param sink: Sink to write to
+        """
+
+        self.sink = sink
+        # set by the caller before the files of a stimulus are saved
+        self.stimulus = None
+        # stimulus -> {filename: digest}
+        self.files = {}
+
+    @staticmethod
+    def digest(data):
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def encode(self, image, extension="png", **options):
+        return self.sink.encode(image, extension, **options)
+
+    def record(self, filename, data):
+        files = self.files.setdefault(self.stimulus, {})
+        if not isinstance(data, Future):
+            files[filename] = self.digest(data)
+            return
+
+        # the digest of bytes encoded in the background is added once they are ready, see ThreadedSink
+        files[filename] = None
+        data.add_done_callback(lambda encoding: files.update({filename: self.digest(encoding.result())}))
+
+    def write(self, filename, data):
+        self.record(filename, data)
+        self.sink.write(filename, data)
+
+    def link(self, filename, source, data):
+        self.record(filename, data)
+        self.sink.link(filename, source, data)
+
+    def close(self):
+        self.sink.close()
+
@@ -0,0 +1,158 @@
+import asyncio
+import collections
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from batch import batch_length
+from encoding import encode_image
+from export import ITEMS
+from pools import DEFAULT_BUDGET, ByteCache
+
+# marks the end of a stream
+_END = object()
+
+
+def stimuli(cls, indices=None, size=None, supersample=1, mode=None, save_options=None, budget=DEFAULT_BUDGET,
+            **kwargs):
+    """
+    Lazily draws the stimuli of a paradigm, one at a time, in the order create_batch saves them. Nothing is drawn
+    before it is requested, so the first stimulus is available at once and indices may be endless, e.g.
+    itertools.count().
+
+    :param cls: Paradigm class
+    :param indices: Indices of the stimuli (or sets), by default those of a batch. SymmetrySpan stimuli from index
+                    n_symm on are asymmetric, and with distinct patterns there are only n_symm + n_asymm of them.
+    :param size: Size (width, height) of the images, by default the paradigm's size
+    :param supersample: See Scene.render
+    :param mode: Mode the images are converted to, by default they keep the smallest mode that holds them
+    :param save_options: Arguments of Canvas.save like extension and depth. If given, encoded bytes are yielded instead
+                         of images.
+    :param budget: Bytes of drawn images kept for members of stimulus pools appearing in several sets
+    :param kwargs: Arguments of create_batch, e.g. seed and config
+    :returns: Generator of (metadata, image or bytes) pairs. The metadata is that of export.export_batch, DotSpan
+              frames also have the frame number and their own name.
+    """
+
+    if indices is None:
+        indices = range(batch_length(cls, **kwargs))
+    if save_options is not None:
+        options = dict(save_options)
+        extension = options.pop("extension", "png")
+
+    # only members of pools are drawn more than once, the cache keeps them within the budget
+    cache = ByteCache(budget)
+    for scenes, metadata in ITEMS[cls](kwargs, indices):
+        for frame, scene in enumerate(scenes, 1):
+            if scene in cache:
+                result = cache[scene]
+            else:
+                result = scene.render(size, supersample=supersample).image
+                if mode is not None:
+                    result = result.convert(mode)
+                if save_options is not None:
+                    result = encode_image(result, extension, **options)
+                cache[scene] = result
+
+            if not isinstance(result, bytes):
+                # cached images are shared, the caller gets its own copy
+                result = result.copy()
+
+            if "frames" in metadata:
+                yield dict(metadata, frame=frame, name=f"{metadata['name']}_dot{frame}"), result
+            else:
+                yield dict(metadata), result
+
+
+def prefetched(items, prefetch=2):
+    """
+    Iterates over items on a background thread, at most prefetch items ahead of the caller. The thread waits while the
+    caller doesn't take items, so memory stays bounded however long the sequence is.
+
+    :param items: Iterable, e.g. from stimuli
+    :param prefetch: Maximum number of items waiting for the caller
+    :returns: Generator of the items
+    """
+
+    waiting = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+
+    def put(item):
+        # gives up when the caller stopped iterating
+        while not stop.is_set():
+            try:
+                waiting.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def work():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((_END, None))
+        except Exception as error:
+            put((_END, error))
+
+    thread = threading.Thread(target=work, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = waiting.get()
+            if error is not None:
+                raise error
+            if item is _END:
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def stream(cls, prefetch=2, **kwargs):
+    """
+    Draws the stimuli of a paradigm on a background thread, prefetch stimuli ahead of the caller.
+
+    :param cls: Paradigm class
+    :param prefetch: Maximum number of drawn stimuli waiting for the caller, 0 draws each stimulus when it is requested
+    :param kwargs: Arguments of stimuli
+    :returns: Generator of (metadata, image or bytes) pairs, see stimuli
+    """
+
+    items = stimuli(cls, **kwargs)
+    if not prefetch:
+        return items
+    return prefetched(items, prefetch)
+
+
+async def astream(cls, prefetch=2, **kwargs):
+    """
+    Asynchronous variant of stream. The stimuli are drawn on a worker thread, off the event loop, at most prefetch of
+    them ahead of the consumer.
+
+    :param cls: Paradigm class
+    :param prefetch: Maximum number of stimuli drawn ahead of the consumer, at least one is drawn at a time
+    :param kwargs: Arguments of stimuli
+    :returns: Asynchronous generator of (metadata, image or bytes) pairs, see stimuli
+    """
+
+    loop = asyncio.get_running_loop()
+    items = stimuli(cls, **kwargs)
+
+    # a single thread advances the generator, one step at a time
+    executor = ThreadPoolExecutor(max_workers=1)
+    pending = collections.deque()
+    try:
+        while True:
+            while len(pending) < max(1, prefetch):
+                pending.append(loop.run_in_executor(executor, next, items, _END))
+
+            item = await pending.popleft()
+            if item is _END:
+                return
+            yield item
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
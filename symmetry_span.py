@@ -1,12 +1,13 @@
-import math
-
-from geometry import Vector, Point
 from canvas import Canvas
 import numpy as np
+from PIL import Image
+
+from patterns import draw_unique, sample_symmetry_patterns
+from scene import Scene, save_scenes
 
 
 class SymmetrySpan(Canvas):
-    def __init__(self, size=(1210, 1210), mode="RGBA", background_color=(255, 255, 255, 255),
+    def __init__(self, size=(1210, 1210), mode="auto", background_color=(255, 255, 255, 255),
                  name="symmetry_span"):
         super(SymmetrySpan, self).__init__(size=size, mode=mode, background_color=background_color, name=name)
 
@@ -14,67 +15,136 @@ class SymmetrySpan(Canvas):
         self.rows = None
         self.cols = None
 
-    def configure_squares(self, rows=8, cols=8, symmetric=True, noise=0.0):
+    def configure_squares(self, rows=8, cols=8, symmetric=True, noise=0.0, index=None):
         self.rows = rows
         self.cols = cols
-
-        left_grid = np.random.binomial(1, 0.5, (self.rows, (self.cols + 1) // 2))
-
-        if self.rows % 2 == 0:
-            right_grid = np.fliplr(left_grid)
-        else:
-            right_grid = np.delete(np.fliplr(left_grid), 0, 1)
+        self.squares = draw_unique(lambda: self.generate_squares(1, rows=rows, cols=cols, symmetric=symmetric,
+                                                                 noise=noise)[0], index)
+
+    @staticmethod
+    def generate_squares(n, rows=8, cols=8, symmetric=True, noise=0.0):
+        """
+        Generates many square patterns at once. The patterns are symmetric about their vertical center line, or, for
+        asymmetric patterns, the right half is replaced by random squares with probability noise. Asymmetric patterns
+        that turn out symmetric by accident get one square of their right half flipped.
+
+        :param n: Number of patterns
+        :param rows: Number of rows of each pattern
+        :param cols: Number of columns of each pattern
+        :param symmetric: Whether the patterns are symmetric
+        :param noise: Probability of each square of the right half being random, only used for asymmetric patterns
+        :returns: Array of zeros and ones with shape (n, rows, cols)
+        """
+
+        left_grid = np.random.binomial(1, 0.5, (n, rows, (cols + 1) // 2))
+
+        # with an odd number of columns, the center column belongs to both halves
+        right_grid = left_grid[:, :, ::-1]
+        if cols % 2 == 1:
+            right_grid = right_grid[:, :, 1:]
 
         if symmetric:
-            self.squares = np.concatenate((left_grid, right_grid), axis=1)
-        else:
-            mask = np.random.rand(*right_grid.shape)
-            rand = np.random.binomial(1, 0.5, right_grid.shape)
-            noisy_right_grid = np.where(mask < noise, rand, right_grid)
+            return np.concatenate((left_grid, right_grid), axis=2)
 
-            if np.array_equal(noisy_right_grid, right_grid):
-                # to avoid accidental symmetric images, at least one square will be changed
-                row = np.random.randint(0, right_grid.shape[0])
-                col = np.random.randint(0, right_grid.shape[1])
-                noisy_right_grid[row][col] = 1 - noisy_right_grid[row][col]
+        mask = np.random.rand(*right_grid.shape)
+        rand = np.random.binomial(1, 0.5, right_grid.shape)
+        noisy_right_grid = np.where(mask < noise, rand, right_grid)
 
-            self.squares = np.concatenate((left_grid, noisy_right_grid), axis=1)
+        # to avoid accidental symmetric images, at least one square will be changed
+        accidental = np.flatnonzero((noisy_right_grid == right_grid).all(axis=(1, 2)))
+        row = np.random.randint(0, right_grid.shape[1], len(accidental))
+        col = np.random.randint(0, right_grid.shape[2], len(accidental))
+        noisy_right_grid[accidental, row, col] = 1 - noisy_right_grid[accidental, row, col]
+
+        return np.concatenate((left_grid, noisy_right_grid), axis=2)
 
     def draw_squares(self, color=(0, 0, 0, 255)):
         # how many pixels high/wide the rows/columns are
         col_step = self.width / self.cols
         row_step = self.height / self.rows
+        side_length = row_step
+
+        # expand the pattern to pixels: a pixel is covered if the square of any of its rows and columns is filled
+        row_cover = self.cell_cover(self.height, self.rows, row_step, side_length)
+        col_cover = self.cell_cover(self.width, self.cols, col_step, side_length)
+        covered = row_cover @ (self.squares.astype(np.float32) @ col_cover.T) > 0
+
+        color = self.ink(color)
+        self.image.paste(color, (0, 0), Image.fromarray(covered))
+
+    @staticmethod
+    def cell_cover(length, n, step, side_length):
+        """
+        Calculates which pixels along one axis are covered by squares centered in the cells, the same way drawing the
+        squares with Canvas.draw_square would cover them.
 
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if self.squares[row][col] == 1:
-                    position = Point((col * col_step) + (col_step / 2), (row * row_step) + (row_step / 2))
-                    side_length = row_step
-                    self.draw_square(position=position, side_length=side_length, color=color)
+        :param length: Number of pixels along the axis
+        :param n: Number of cells along the axis
+        :param step: Size of each cell in pixels
+        :param side_length: Side length of the squares in pixels
+        :returns: Array of zeros and ones with shape (length, n), as float32 for fast matrix products
+        """
+
+        centers = (np.arange(n) * step) + (step / 2)
+        starts = np.trunc(centers - side_length / 2)
+        ends = np.trunc(centers + side_length / 2)
+
+        pixels = np.arange(length)[:, None]
+        return ((pixels >= starts) & (pixels <= ends)).astype(np.float32)
 
     def draw_grid(self, rows=None, cols=None, color=(0, 0, 0, 255), line_thickness=None):
         super(SymmetrySpan, self).draw_grid(rows=self.rows, cols=self.cols, color=color)
 
     @classmethod
-    def create_batch(cls, n_symm=6, n_asymm=6, asym_noise=0.5, rows=8, cols=8, folder="symmetry_span/",
-                     image_size=(1210, 1210), background_color=(255, 255, 255, 255), square_color=(0, 0, 0, 255),
-                     line_color=(0, 0, 0, 255)):
+    def create_scenes(cls, n_symm=6, n_asymm=6, asym_noise=0.5, rows=8, cols=8, folder="symmetry_span/",
+                      image_size=(1210, 1210), background_color=(255, 255, 255, 255), square_color=(0, 0, 0, 255),
+                      line_color=(0, 0, 0, 255), seed=None, indices=None, index=None, distinct=False):
+        # the symmetric stimuli come first, followed by the asymmetric ones
+        if indices is None:
+            indices = range(n_symm + n_asymm)
+
+        # distinct patterns are drawn for the whole batch at once, uniformly among all symmetric and asymmetric grids
+        # (asym_noise is not used). Every job draws the same patterns, so they are distinct however the batch is split.
+        if distinct:
+            if index is not None:
+                raise ValueError("Distinct patterns are not drawn from an index!")
+            if seed is not None:
+                cls.seed_batch(seed)
+            patterns = np.concatenate((sample_symmetry_patterns(n_symm, rows, cols, symmetric=True),
+                                       sample_symmetry_patterns(n_asymm, rows, cols, symmetric=False)))
 
         num_of_digits = len(str(n_symm + n_asymm - 1))
-        for i in range(n_symm):
-            name = f"symm{i:0>{num_of_digits}}"
-
-            stimulus = cls(size=image_size, background_color=background_color, name=name)
-            stimulus.configure_squares(rows=rows, cols=cols, symmetric=True)
-            stimulus.draw_squares(color=square_color)
-            stimulus.draw_grid(color=line_color)
-            stimulus.save(path=folder)
-
-        for i in range(n_asymm):
-            name = f"asym{i:0>{num_of_digits}}"
-
-            stimulus = cls(size=image_size, background_color=background_color, name=name)
-            stimulus.configure_squares(rows=rows, cols=cols, symmetric=False, noise=asym_noise)
-            stimulus.draw_squares(color=square_color)
-            stimulus.draw_grid(color=line_color)
-            stimulus.save(path=folder)
+        for i in indices:
+            if distinct and not 0 <= i < len(patterns):
+                raise ValueError(f"There is no stimulus {i}, a batch of distinct patterns has {len(patterns)} stimuli!")
+            if seed is not None:
+                cls.seed_random(seed, i)
+
+            symmetric = i < n_symm
+            if symmetric:
+                name = f"symm{i:0>{num_of_digits}}"
+            else:
+                name = f"asym{i - n_symm:0>{num_of_digits}}"
+
+            if distinct:
+                squares = patterns[i]
+            else:
+                # patterns in the index are drawn again
+                squares = draw_unique(lambda: cls.generate_squares(1, rows=rows, cols=cols, symmetric=symmetric,
+                                                                   noise=asym_noise)[0], index)
+            stimulus = Scene(cls, image_size, name=name, background_color=background_color,
+                             state={"rows": rows, "cols": cols, "squares": squares})
+            stimulus.add("draw_squares", color=square_color)
+            stimulus.add("draw_grid", color=line_color)
+            yield f"{folder}{name}", stimulus
+
+    @classmethod
+    def create_batch(cls, n_symm=6, n_asymm=6, asym_noise=0.5, rows=8, cols=8, folder="symmetry_span/",
+                     image_size=(1210, 1210), background_color=(255, 255, 255, 255), square_color=(0, 0, 0, 255),
+                     line_color=(0, 0, 0, 255), seed=None, indices=None, sink=None, save_options=None,
+                     image_sizes=None, supersample=1, index=None, distinct=False):
+        scenes = cls.create_scenes(n_symm=n_symm, n_asymm=n_asymm, asym_noise=asym_noise, rows=rows, cols=cols,
+                                   folder=folder, image_size=image_size, background_color=background_color,
+                                   square_color=square_color, line_color=line_color, seed=seed, indices=indices,
+                                   index=index, distinct=distinct)
+        save_scenes(scenes, sizes=image_sizes, sink=sink, supersample=supersample, save_options=save_options)
@@ -0,0 +1,40 @@
+import gc
+import weakref
+
+import pytest
+
+from arrow_span import ArrowSpan
+from atlas import Atlas, pool_atlas
+from pools import LazyPool
+from rotation_span import RotationSpan
+from sinks import MemorySink
+
+
+@pytest.mark.parametrize("cls, folder", [(ArrowSpan, "arrow_span/"), (RotationSpan, "rotation_span/")])
+def test_atlas_sets_from_iterator(cls, folder):
+    sink = MemorySink()
+    cls.create_batch(seed=1, indices=iter([0, 1, 2]), atlas=True, sink=sink)
+
+    assert [filename for filename, _, _ in sink.files] == [f"{folder}atlas.png"] + [f"{folder}set{i}.json"
+                                                                                     for i in range(3)]
+
+
+def test_pool_atlas_is_freed_with_pool():
+    pool = ArrowSpan.create_all_arrows()
+    atlas = pool_atlas(pool, (300, 300))
+
+    assert pool_atlas(pool, (300, 300)) is atlas
+    assert pool_atlas(pool) is not atlas
+
+    pool_reference = weakref.ref(pool)
+    del pool
+    gc.collect()
+    assert pool_reference() is None
+
+
+def test_empty_pool():
+    atlas = Atlas(LazyPool([]))
+
+    assert atlas.members == []
+    assert atlas.image.size == (1, 1)
+    assert atlas.set_index([], "atlas.png")["members"] == []
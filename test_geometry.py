@@ -0,0 +1,21 @@
+import pytest
+
+from geometry import Point, Vector, VectorArray
+
+
+def test_vector_minus_scalar():
+    # the baseline added the scalar instead of subtracting it
+    assert Vector(3, 5) - 2 == Vector(1, 3)
+    assert Vector(3, 5) - Vector(1, 1) == Vector(2, 4)
+
+
+def test_vector_minus_point():
+    with pytest.raises(TypeError):
+        Vector(3, 5) - Point(1, 1)
+
+
+def test_vector_array_matches_vector():
+    vectors = [Vector(3, 5), Vector(-1, 2.5)]
+    array = VectorArray(vectors) - 2
+
+    assert [tuple(vector) for vector in array.xy] == [tuple(vector - 2) for vector in vectors]
@@ -0,0 +1,23 @@
+import instrumentation
+from arrow_span import ArrowSpan
+from sinks import ArchiveSink
+
+
+def test_links_add_no_bytes(tmp_path):
+    instrumentation.enable()
+    instrumentation.reset()
+    try:
+        with ArchiveSink(str(tmp_path / "stimuli.tar")) as sink:
+            ArrowSpan.create_batch(seed=1, indices=range(4), sink=sink)
+        summary = instrumentation.report()
+    finally:
+        instrumentation.disable()
+        instrumentation.reset()
+
+    stages = {stage["stage"]: stage for stage in summary["stages"] if stage["paradigm"] == "ArrowSpan"}
+    counters = {counter["counter"]: counter["count"] for counter in summary["counters"]
+                if counter["paradigm"] == "ArrowSpan"}
+
+    assert stages["ArchiveSink.link"]["calls"] == counters["links"] > 0
+    assert stages["ArchiveSink.link"]["bytes"] == 0
+    assert stages["ArchiveSink.write"]["bytes"] == stages["Sink.encode"]["bytes"]
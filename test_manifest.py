@@ -0,0 +1,17 @@
+from manifest import Manifest
+from patterns import PatternIndex
+from symmetry_span import SymmetrySpan
+
+
+def test_pattern_index_is_an_input():
+    without = Manifest.inputs(SymmetrySpan, {}, 1, 0)
+    first = Manifest.inputs(SymmetrySpan, {"index": PatternIndex(8, 8)}, 1, 0)
+
+    index = PatternIndex(8, 8)
+    index.add(SymmetrySpan.generate_squares(1)[0])
+    second = Manifest.inputs(SymmetrySpan, {"index": index}, 1, 0)
+
+    assert first != without
+    # the content of the index grows while stimuli are drawn, only the index itself is an input
+    assert first == second
+    assert Manifest.inputs(SymmetrySpan, {"index": PatternIndex(8, 8, "index.txt")}, 1, 0) != first
@@ -0,0 +1,45 @@
+import threading
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from server import MAX_SIDE, StimulusServer, parse_request
+
+
+@pytest.fixture(scope="module")
+def url():
+    server = StimulusServer(("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_port}/stimulus"
+
+    server.shutdown()
+    server.server_close()
+
+
+def status(url, query):
+    try:
+        with urlopen(f"{url}?{query}") as response:
+            response.read()
+            return response.status
+    except HTTPError as error:
+        return error.code
+
+
+@pytest.mark.parametrize("paradigm", ["arrow_span", "rotation_span", "dot_span", "symmetry_span"])
+def test_supersample_without_size_is_limited(url, paradigm):
+    # the default size of 1210 pixels is only known once the paradigm's scenes are created
+    assert status(url, f"paradigm={paradigm}&seed=1&set=0&supersample=50") == 400
+
+
+def test_supersample_with_size_is_limited(url):
+    with pytest.raises(ValueError):
+        parse_request(f"paradigm=dot_span&seed=1&set=0&size={MAX_SIDE // 2 + 1}&supersample=2")
+    assert status(url, f"paradigm=dot_span&seed=1&set=0&size={MAX_SIDE // 2 + 1}&supersample=2") == 400
+
+
+def test_supersample_within_limit(url):
+    assert status(url, "paradigm=symmetry_span&seed=1&set=0&size=100&supersample=2") == 200
+    assert status(url, "paradigm=arrow_span&seed=1&set=0&supersample=2") == 200
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+from PIL import Image
+
+from arrow_span import ArrowSpan
+from dot_span import DotSpan
+from rotation_span import RotationSpan
+from sinks import Encoding, MemorySink, RecordingSink, ThreadedSink
+from symmetry_span import SymmetrySpan
+
+
+class SpySink(MemorySink):
+    """
+    Keeps the files in memory and the names of the threads that encoded them.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+
+    def encode(self, image, extension="png", **options):
+        self.threads.append(threading.current_thread().name)
+        return super().encode(image, extension, **options)
+
+
+@pytest.mark.parametrize("cls", [ArrowSpan, RotationSpan, DotSpan, SymmetrySpan])
+def test_threaded_sink_encodes_in_background(cls):
+    spy = SpySink()
+    with ThreadedSink(spy) as sink:
+        cls.create_batch(seed=1, indices=[0, 1], sink=sink)
+
+    assert spy.files
+    assert spy.threads
+    assert threading.main_thread().name not in spy.threads
+
+
+def test_threaded_files_match_direct_files():
+    direct = MemorySink()
+    ArrowSpan.create_batch(seed=1, indices=[0, 1], sink=direct)
+
+    threaded = MemorySink()
+    with ThreadedSink(threaded) as sink:
+        ArrowSpan.create_batch(seed=1, indices=[0, 1], sink=sink)
+
+    assert threaded.files == direct.files
+
+
+def test_recording_sink_digests_background_encodings():
+    direct = RecordingSink(MemorySink())
+    direct.stimulus = 0
+    SymmetrySpan.create_batch(seed=1, indices=[0], sink=direct)
+
+    memory = MemorySink()
+    with ThreadedSink(memory) as sink:
+        recording = RecordingSink(sink)
+        recording.stimulus = 0
+        SymmetrySpan.create_batch(seed=1, indices=[0], sink=recording)
+
+    assert recording.files == direct.files
+
+
+def test_pending_encoding_fails_after_error():
+    release = threading.Event()
+
+    class FailingSink(MemorySink):
+        def write(self, filename, data):
+            release.wait()
+            raise OSError("disk full")
+
+    sink = ThreadedSink(FailingSink())
+    sink.write("first.png", b"")
+    encoding = sink.encode(Image.new("L", (10, 10)))
+    assert isinstance(encoding, Encoding)
+
+    release.set()
+    with pytest.raises(OSError):
+        encoding.result(timeout=5)
+    with pytest.raises(OSError):
+        sink.close()
@@ -0,0 +1,39 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from streaming import stimuli
+from symmetry_span import SymmetrySpan
+
+
+def test_distinct_patterns_are_distinct():
+    scenes = SymmetrySpan.create_scenes(seed=1, distinct=True)
+    keys = {np.asarray(scene.state["squares"]).tobytes() for _, scene in scenes}
+
+    assert len(keys) == 12
+
+
+@pytest.mark.parametrize("index", [12, 100, -1])
+def test_distinct_index_out_of_batch(index):
+    with pytest.raises(ValueError, match="distinct patterns has 12 stimuli"):
+        list(SymmetrySpan.create_scenes(seed=1, indices=[index], distinct=True))
+
+
+def test_distinct_stream_ends_with_batch():
+    streamed = stimuli(SymmetrySpan, indices=itertools.count(), seed=1, distinct=True)
+
+    assert len(list(itertools.islice(streamed, 12))) == 12
+    with pytest.raises(ValueError):
+        next(streamed)
+
+
+@pytest.mark.parametrize("rows, cols", [(8, 8), (8, 7), (7, 8), (7, 7)])
+def test_generated_squares_shape(rows, cols):
+    # the baseline chose how to mirror by the parity of the rows, so 8x7 grids got 8 columns and 7x8 grids 7
+    symmetric = SymmetrySpan.generate_squares(20, rows=rows, cols=cols, symmetric=True)
+    asymmetric = SymmetrySpan.generate_squares(20, rows=rows, cols=cols, symmetric=False, noise=0.5)
+
+    assert symmetric.shape == asymmetric.shape == (20, rows, cols)
+    assert all(np.array_equal(grid, grid[:, ::-1]) for grid in symmetric)
+    assert not any(np.array_equal(grid, grid[:, ::-1]) for grid in asymmetric)
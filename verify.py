@@ -0,0 +1,343 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from functools import partial
+
+import numpy as np
+import PIL
+from PIL import Image
+
+from arrow_span import ArrowSpan
+from atlas import Atlas
+from canvas import Canvas, mode_color
+from dot_span import DotSpan
+from reference import ReferenceCanvas, render_reference
+from rotation_span import RotationSpan
+from sinks import Sink
+from streaming import stimuli
+from symmetry_span import SymmetrySpan
+
+SIZES = ((1210, 1210), (300, 300), (401, 233))
+ANGLES = (0, 30, 45, 90, 135, 180, 270, 315)
+BACKGROUNDS = ((255, 255, 255, 255), (128, 128, 128, 255), (250, 240, 200, 255))
+# sizes the paradigm scenes are rendered at, None being each scene's reference size
+SCENE_SIZES = (None, (600, 600), (401, 233))
+# indices of the streamed stimuli, out of order and including asymmetric SymmetrySpan stimuli
+STREAM_INDICES = (7, 0, 3, 5)
+
+
+def primitive_calls(size):
+    """
+    Lists the drawing calls of the primitive cases for a canvas size.
+
+    :param size: Size (width, height) of the canvas
+    :returns: Dict mapping the name of each case to its list of (method name, keyword arguments) pairs
+    """
+
+    width, height = size
+    calls = {"grid": [("draw_grid", {})],
+             "grid7x5": [("draw_grid", {"rows": 7, "cols": 5, "color": (10, 20, 30, 128)})],
+             "dot": [("draw_dot", {})],
+             "dot_offset": [("draw_dot", {"center": (width / 3, height / 3), "radius": height / 7,
+                                          "color": (200, 0, 0, 255)})],
+             "square": [("draw_square", {"color": (0, 0, 255, 255)})],
+             "checker": [("draw_grid", {}), ("draw_checker_pattern", {})]}
+
+    for angle in ANGLES:
+        calls[f"arrow{angle}"] = [("draw_radial_arrow", {"angle": angle})]
+        for mirror in (False, True):
+            calls[f"letter_G{angle}{'m' if mirror else ''}"] = [("draw_letter", {"letter": "G", "angle": angle,
+                                                                                 "mirror": mirror})]
+            calls[f"letter_R{angle}{'m' if mirror else ''}"] = [
+                ("draw_letter", {"letter": "R", "location": (width / 3, height / 4), "angle": angle, "mirror": mirror,
+                                 "color": (200, 0, 0, 180)})]
+
+    return calls
+
+
+def draw_calls(cls, size, background_color, calls):
+    # draws on a new canvas of the given class, Canvas or ReferenceCanvas
+    canvas = cls(size=size, background_color=background_color)
+    for method, kwargs in calls:
+        getattr(canvas, method)(**kwargs)
+
+    return canvas.image
+
+
+def canvas_cases(seed=0):
+    # the Canvas primitives on white canvases of every size, and on other backgrounds at one size
+    for size in SIZES:
+        for background in BACKGROUNDS if size == (300, 300) else BACKGROUNDS[:1]:
+            prefix = f"canvas/{size[0]}x{size[1]}"
+            if background != BACKGROUNDS[0]:
+                prefix += "/" + "".join(f"{value:02x}" for value in background)
+
+            for name, calls in primitive_calls(size).items():
+                yield (f"{prefix}/{name}", draw_calls(Canvas, size, background, calls),
+                       partial(draw_calls, ReferenceCanvas, size, background, calls))
+
+
+def size_name(size, scene):
+    size = size or scene.size
+    return f"{size[0]}x{size[1]}"
+
+
+def pool_scenes():
+    # the arrow and letter pools the sets of ArrowSpan and RotationSpan are drawn from
+    return {ArrowSpan: ArrowSpan.create_arrow_scenes(), RotationSpan: RotationSpan.create_letter_scenes()}
+
+
+def dot_stimuli(seed, batch_size=10):
+    return DotSpan.create_stimuli(batch_size=batch_size, seed=seed)
+
+
+def scene_cases(seed=0):
+    # every paradigm rendered through Scene.render, at the reference size and scaled
+    scenes = [(f"{cls.__name__}/{i}", scene) for cls, pool in pool_scenes().items() for i, scene in enumerate(pool)]
+    scenes += [(f"SymmetrySpan/{name}", scene) for name, scene in SymmetrySpan.create_scenes(seed=seed)]
+    for stimulus in dot_stimuli(seed):
+        scenes += [(f"DotSpan/{name}", scene) for name, scene in stimulus.frame_scenes()]
+
+    for size in SCENE_SIZES:
+        for name, scene in scenes:
+            yield (f"scene/{size_name(size, scene)}/{name}", scene.render(size).image,
+                   partial(render_reference, scene, size))
+
+
+class CaptureSink(Sink):
+    """
+    Keeps the images saved to it instead of encoding them.
+    """
+
+    def __init__(self):
+        self.images = []
+
+    def save(self, image, filename, extension="png", **options):
+        self.images.append((filename, image.copy()))
+
+
+def frame_cases(seed=0):
+    # the frames of DotSpan.draw_dots_one_by_one, which only redraws the area of the last dot between frames
+    for stimulus in dot_stimuli(seed):
+        scenes = stimulus.frame_scenes()
+        sink = CaptureSink()
+        stimulus.draw_dots_one_by_one(sink=sink)
+
+        for (name, scene), (_, image) in zip(scenes, sink.images):
+            yield f"frames/{name}", image, partial(render_reference, scene)
+
+
+def atlas_image(atlas, item):
+    # draws a member of the pool from the atlas, like a viewer of the set indices would
+    image = Image.new(atlas.mode, atlas.size, mode_color(atlas.background_color, atlas.mode))
+    placement = atlas.region(item)
+    if placement is not None:
+        (x, y, width, height), offset = placement
+        image.paste(atlas.image.crop((x, y, x + width, y + height)), offset)
+
+    return image
+
+
+def atlas_cases(seed=0):
+    # the members of the pools drawn from their atlases
+    for cls, pool in pool_scenes().items():
+        for size in SCENE_SIZES[:2]:
+            atlas = Atlas(pool, size)
+            for i, scene in enumerate(pool):
+                yield (f"atlas/{size_name(size, scene)}/{cls.__name__}/{i}", atlas_image(atlas, i),
+                       partial(render_reference, scene, size))
+
+
+def stream_reference(cls, seed, metadata):
+    # the scene of a streamed stimulus, created on its own from the set of its metadata
+    scenes = [scene for _, scene in cls.create_scenes(seed=seed, indices=[metadata["set"]])]
+    return render_reference(scenes[metadata["item"] + metadata.get("frame", 1) - 1])
+
+
+def stream_cases(seed=0):
+    # the stimuli of every paradigm streamed from indices that can only be read once, like itertools.count()
+    for cls in (ArrowSpan, RotationSpan, DotSpan, SymmetrySpan):
+        for metadata, image in stimuli(cls, indices=iter(STREAM_INDICES), seed=seed):
+            yield (f"stream/{cls.__name__}/{metadata['set']}/{metadata['name']}", image,
+                   partial(stream_reference, cls, seed, metadata))
+
+
+# optimized rendering paths and the functions listing their cases as (name, image, function drawing the reference)
+PATHS = {"canvas": canvas_cases, "scene": scene_cases, "frames": frame_cases, "atlas": atlas_cases,
+         "stream": stream_cases}
+
+
+def rgba_pixels(image):
+    return np.asarray(image.convert("RGBA"))
+
+
+def pixel_digest(pixels):
+    """
+    Compact digest of the pixels of an image, including its size.
+
+    :param pixels: Array of shape (height, width, 4), see rgba_pixels
+    :returns: Hexadecimal digest
+    """
+
+    # SHA-256 has hardware support on most CPUs and is faster than BLAKE2 for images, a prefix is enough
+    digest = hashlib.sha256(np.asarray(pixels.shape, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(pixels))
+
+    return digest.hexdigest()[:16]
+
+
+def compare_pixels(expected, actual, tolerance=0):
+    """
+    Compares two images pixel by pixel.
+
+    :param expected: Pixels of the reference image, see rgba_pixels
+    :param actual: Pixels of the image to check
+    :param tolerance: Largest difference of a channel that is still accepted
+    :returns: Dict with the number of pixels differing by more than the tolerance, the number of differing pixels and
+              the largest difference of a channel
+    """
+
+    if expected.shape != actual.shape:
+        total = max(expected.shape[0] * expected.shape[1], actual.shape[0] * actual.shape[1])
+        return {"failed": total, "different": total, "max": 255}
+
+    # whole pixels are compared as 32-bit words, only the differing ones are compared channel by channel
+    different = np.ascontiguousarray(expected).view(np.uint32) != np.ascontiguousarray(actual).view(np.uint32)
+    different = different[..., 0]
+    difference = np.abs(expected[different].astype(np.int16) - actual[different]).max(axis=1, initial=0)
+
+    return {"failed": int(np.count_nonzero(difference > tolerance)), "different": len(difference),
+            "max": int(difference.max(initial=0))}
+
+
+def verify(cases, golden=None, tolerance=0):
+    """
+    Checks images of the optimized paths against the reference implementation. An image matching the golden digest of
+    its case is identical to the reference, which is then not drawn at all.
+
+    :param cases: Iterable of (name, image, function drawing the reference) triples, e.g. from the PATHS
+    :param golden: Dict mapping case names to digests of the reference images, see load_golden
+    :param tolerance: Largest difference of a channel that is still accepted
+    :returns: List of result dicts with the name, status ("golden", "equal", "tolerated" or "failed"), digest of the
+              reference and the counts of compare_pixels
+    """
+
+    if golden is None:
+        golden = {}
+
+    results = []
+    for name, image, reference in cases:
+        actual = rgba_pixels(image)
+        digest = pixel_digest(actual)
+        if golden.get(name) == digest:
+            results.append({"name": name, "status": "golden", "digest": digest, "failed": 0, "different": 0,
+                            "max": 0})
+            continue
+
+        expected = rgba_pixels(reference())
+        result = dict(compare_pixels(expected, actual, tolerance), name=name, digest=pixel_digest(expected))
+        if result["failed"]:
+            result["status"] = "failed"
+        elif result["different"]:
+            result["status"] = "tolerated"
+        else:
+            result["status"] = "equal"
+        results.append(result)
+
+    return results
+
+
+def load_golden(path, seed=0):
+    """
+    Loads the golden digests. Pillow's rasterization may change between versions, so digests recorded with another
+    version are not used.
+
+    :param path: Path of the JSON file written by save_golden
+    :param seed: Seed of the corpus
+    :returns: Dict mapping case names to digests, empty if the file doesn't exist or is from another Pillow version
+              or seed
+    """
+
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as file:
+        data = json.load(file)
+    if data.get("pillow") != PIL.__version__ or data.get("seed") != seed:
+        print(f"Ignoring {path}, it was recorded with Pillow {data.get('pillow')} and seed {data.get('seed')}")
+        return {}
+
+    return data["cases"]
+
+
+def save_golden(path, results, seed=0):
+    """
+    Writes the digests of the reference images, keeping those of other cases recorded with the same Pillow version and
+    seed.
+
+    :param path: Path of the JSON file
+    :param results: Results of verify
+    :param seed: Seed of the corpus
+    :returns: None
+    """
+
+    cases = load_golden(path, seed)
+    cases.update((result["name"], result["digest"]) for result in results)
+    with open(path, "w") as file:
+        json.dump({"pillow": PIL.__version__, "seed": seed, "cases": cases}, file, indent=0, sort_keys=True)
+
+
+def format_result(result):
+    if result["status"] in ("golden", "equal"):
+        return f"{result['status']:<9} {result['name']}"
+
+    return (f"{result['status']:<9} {result['name']}: {result['different']} pixels differ, {result['failed']} by more "
+            f"than the tolerance, largest channel difference {result['max']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks that the optimized rendering paths draw the same pixels as "
+                                                 "the reference implementation, on a seeded corpus of stimuli.")
+    parser.add_argument("--paths", nargs="+", default=list(PATHS), choices=list(PATHS),
+                        help="rendering paths to check (default: all)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the paradigm stimuli of the corpus (default: 0)")
+    parser.add_argument("--tolerance", type=int, default=0,
+                        help="largest accepted difference of a color channel (default: 0, pixel-exact)")
+    parser.add_argument("--golden", default="golden.json",
+                        help="file of the digests of the reference images, images matching them are not compared "
+                             "with a freshly drawn reference (default: golden.json)")
+    parser.add_argument("--full", action="store_true",
+                        help="draw and compare every reference image, ignoring the golden digests")
+    parser.add_argument("--update", action="store_true",
+                        help="draw every reference image and write its digest to the golden file")
+    parser.add_argument("--verbose", action="store_true",
+                        help="list every case, not only those that differ")
+    args = parser.parse_args()
+
+    golden = {} if args.full or args.update else load_golden(args.golden, args.seed)
+
+    start = time.perf_counter()
+    results = []
+    for path in args.paths:
+        results += verify(PATHS[path](seed=args.seed), golden=golden, tolerance=args.tolerance)
+    duration = time.perf_counter() - start
+
+    for result in results:
+        if args.verbose or result["status"] in ("tolerated", "failed"):
+            print(format_result(result))
+
+    counts = {status: sum(result["status"] == status for result in results)
+              for status in ("golden", "equal", "tolerated", "failed")}
+    print(f"Checked {len(results)} images in {duration:.2f} s: " + ", ".join(f"{count} {status}"
+                                                                             for status, count in counts.items()))
+
+    if args.update:
+        save_golden(args.golden, results, args.seed)
+        print(f"Wrote {len(results)} digests to {args.golden}")
+
+    if counts["failed"]:
+        sys.exit(1)